@@ -0,0 +1,187 @@
+""" Content-hash cache for incremental builds of the book.
+
+Sphinx (and thus jupyter-book) decides which pages to rebuild based on file
+modification times, which are meaningless after a fresh `git checkout` (e.g.,
+on GitHub Actions). This script keeps a manifest with a hash of each page
+(markdown/notebook) and the local files it references (images, data files,
+modules), which `build_book --incremental` uses to rebuild only changed pages:
+
+    python book_cache.py changed  # prints changed pages, restores mtimes of unchanged ones
+    python book_cache.py update   # stores the hashes after a successful build
+"""
+import os
+import re
+import sys
+import json
+import glob
+import hashlib
+import fnmatch
+
+
+BOOK_DIR = 'intropy'
+MANIFEST = os.path.join(BOOK_DIR, '_build', '.page_hashes.json')
+
+# Changes to these files affect every page
+GLOBAL_FILES = ['_config.yml', '_toc.yml', 'references.bib']
+
+# Same as `exclude_patterns` in _config.yml
+EXCLUDE = ['_build/*', '*.ipynb_checkpoints*', 'tutorials/*/*ipynb', '*.pytest_cache*',
+           'solutions/assignment*/*', 'autograded/*', 'submitted/*', 'feedback/*']
+
+# Candidate references to local files (e.g., "../img/logo.png" or "example_data.csv")
+# and imported local modules (e.g., "from tests import ...")
+FILE_PATTERN = re.compile(r'[\w./-]+\.(?:png|jpe?g|gif|svg|csv|tsv|txt|xlsx|py)\b', re.IGNORECASE)
+IMPORT_PATTERN = re.compile(r'(?:from|import)\s+(\w+)')
+
+# Files written by the notebooks themselves (e.g., "plt.savefig('fig.png')") are not dependencies
+WRITE_PATTERN = re.compile(r'(?:savefig|to_csv|to_excel|save)\(\s*[\'"]([^\'"]+)[\'"]')
+
+
+def _sha1(path):
+    with open(path, 'rb') as f_in:
+        return hashlib.sha1(f_in.read()).hexdigest()
+
+
+def find_pages(book_dir=BOOK_DIR):
+    """ Finds all pages (markdown files and notebooks) of the book. """
+    pages = []
+    for ext in ('md', 'ipynb'):
+        for path in glob.glob(os.path.join(book_dir, '**', f'*.{ext}'), recursive=True):
+            rel = os.path.relpath(path, book_dir)
+            if not any(fnmatch.fnmatch(rel, pattern) for pattern in EXCLUDE):
+                pages.append(path)
+
+    return sorted(pages)
+
+
+def _referenced_files(text, base_dir):
+    """ Finds the existing local files referenced (or imported) in a text. """
+    candidates = FILE_PATTERN.findall(text)
+    candidates += [name + '.py' for name in IMPORT_PATTERN.findall(text)]
+    written = set(WRITE_PATTERN.findall(text))
+    paths = (os.path.normpath(os.path.join(base_dir, cand)) for cand in set(candidates) - written)
+    return {path for path in paths if os.path.isfile(path)}
+
+
+def find_dependencies(page, code_only=False):
+    """ Finds the local files referenced by a page.
+
+    Local modules are followed recursively, so a notebook that imports
+    `tests.py` also depends on the modules that `tests.py` imports (e.g.,
+    `references.py`), and on the files these refer to.
+
+    Parameters
+    ----------
+    page : str
+        Path to the page (markdown file or notebook)
+    code_only : bool
+        Whether to only consider the code cells of a notebook
+
+    Returns
+    -------
+    deps : list
+        Paths to the referenced files
+    """
+    with open(page, encoding='utf-8') as f_in:
+        text = f_in.read()
+
+    if page.endswith('.ipynb'):  # only look at the cells (not at the outputs)
+        cells = json.loads(text)['cells']
+        text = '\n'.join(''.join(cell['source']) for cell in cells
+                         if not code_only or cell['cell_type'] == 'code')
+
+    page = os.path.normpath(page)
+    deps = set()
+    todo = _referenced_files(text, os.path.dirname(page))
+    while todo:
+        path = todo.pop()
+        if path in deps or path == page:
+            continue
+
+        deps.add(path)
+        if path.endswith('.py'):
+            with open(path, encoding='utf-8', errors='replace') as f_in:
+                todo |= _referenced_files(f_in.read(), os.path.dirname(path)) - deps
+
+    return sorted(deps)
+
+
+def compute_hashes(book_dir=BOOK_DIR):
+    """ Computes the hashes of all pages, their dependencies and the global files.
+
+    Returns
+    -------
+    files : dict
+        Hash of each individual file (pages, dependencies and global files)
+    pages : dict
+        Combined hash of each page and its dependencies
+    """
+    files, pages = {}, {}
+    for page in find_pages(book_dir):
+        deps = find_dependencies(page)
+        h = hashlib.sha1()
+        for path in [page] + deps:
+            if path not in files:
+                files[path] = _sha1(path)
+            h.update(path.encode() + files[path].encode())
+        pages[page] = h.hexdigest()
+
+    for fname in GLOBAL_FILES:
+        path = os.path.join(book_dir, fname)
+        if os.path.isfile(path):
+            files[path] = _sha1(path)
+
+    return files, pages
+
+
+def load_manifest(manifest=MANIFEST):
+    if not os.path.isfile(manifest):
+        return {'files': {}, 'pages': {}}
+
+    with open(manifest) as f_in:
+        return json.load(f_in)
+
+
+def changed_pages(book_dir=BOOK_DIR, manifest=MANIFEST):
+    """ Determines which pages changed since the last build.
+
+    The modification time of unchanged files is set back to the time recorded
+    at the last build, so that Sphinx does not rebuild the corresponding pages.
+    When a global file (e.g., _config.yml) changed, all pages are returned.
+
+    Returns
+    -------
+    changed : list
+        Paths to the pages that should be rebuilt
+    """
+    old = load_manifest(manifest)
+    files, pages = compute_hashes(book_dir)
+    global_paths = [os.path.join(book_dir, fname) for fname in GLOBAL_FILES]
+    if any(files.get(p) != old['files'].get(p, {}).get('hash') for p in global_paths):
+        return sorted(pages)
+
+    for path, h in files.items():
+        entry = old['files'].get(path)
+        if entry is not None and entry['hash'] == h:
+            os.utime(path, (entry['mtime'], entry['mtime']))
+
+    return [page for page, h in pages.items() if old['pages'].get(page) != h]
+
+
+def update_manifest(book_dir=BOOK_DIR, manifest=MANIFEST):
+    """ Stores the current hashes (and modification times) in the manifest. """
+    files, pages = compute_hashes(book_dir)
+    files = {path: {'hash': h, 'mtime': os.path.getmtime(path)} for path, h in files.items()}
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    with open(manifest, 'w') as f_out:
+        json.dump({'files': files, 'pages': pages}, f_out, indent=1)
+
+
+if __name__ == '__main__':
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ''
+    if cmd == 'changed':
+        print('\n'.join(changed_pages()))
+    elif cmd == 'update':
+        update_manifest()
+    else:
+        sys.exit("Usage: python book_cache.py [changed|update]")
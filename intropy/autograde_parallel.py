@@ -0,0 +1,389 @@
+""" Autogrades all submissions of an assignment in parallel.
+
+`nbgrader autograde` executes the submitted notebooks one after another,
+which takes hours for a full cohort. This script runs `nbgrader autograde`
+for several students at the same time, each in its own worker process (so
+one kernel per worker). To prevent the workers from fighting over the
+(SQLite) gradebook, each worker writes to its own copy of the gradebook,
+after which the results are merged back into `gradebook.db` in batches
+(one transaction per batch instead of one per notebook).
+
+Each submission runs under resource limits (Mac/Linux only), so that a
+single infinite loop or giant array cannot stall the grading machine: every
+process (i.e., `nbgrader` and the kernel of each notebook) gets a maximum
+CPU time and memory (address space), on top of the wall-time limits per
+cell and per submission. The CPU time, peak memory and wall time of each
+submission are recorded in the `resource_usage` table of the gradebook.
+
+Run it from the course root (the directory with `nbgrader_config.py`), e.g.:
+
+    python autograde_parallel.py week_1 --workers 8 --timeout 300 --memory-limit 4096
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import signal
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# Tables with submission data, in the order in which rows should be deleted
+SUBMISSION_TABLES = ['grade', 'comment', 'submitted_notebook', 'submitted_assignment']
+
+# Resource usage per submission (not an nbgrader table, so it survives `nbgrader db upgrade`)
+USAGE_TABLE = """CREATE TABLE IF NOT EXISTS resource_usage (
+    assignment TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    wall_time REAL,
+    cpu_time REAL,
+    max_rss_mb REAL,
+    graded_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (assignment, student_id)
+)"""
+
+
+def find_students(assignment, submitted_dir='submitted'):
+    """ Finds the IDs of all students that submitted a given assignment. """
+    paths = sorted(glob.glob(os.path.join(submitted_dir, '*', assignment)))
+    return [os.path.basename(os.path.dirname(p)) for p in paths]
+
+
+def count_notebooks(assignment, source_dir='solutions'):
+    """ Counts the notebooks of an assignment (at least one). """
+    return max(len(glob.glob(os.path.join(source_dir, assignment, '*.ipynb'))), 1)
+
+
+def copy_gradebook(src, dst):
+    """ Copies a gradebook using SQLite's backup API (safe while it is open). """
+    with sqlite3.connect(src) as src_con, sqlite3.connect(dst) as dst_con:
+        src_con.backup(dst_con)
+
+
+# Sets the resource limits (CPU time in seconds and address space in bytes; -1 means
+# no limit) and then replaces itself by the command; used instead of `preexec_fn`,
+# which is not safe when the process is started from a thread
+LIMIT_WRAPPER = """import os, sys, resource
+cpu, mem = int(sys.argv[1]), int(sys.argv[2])
+if cpu >= 0:  # SIGXCPU at the soft limit, killed at the hard limit
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 5))
+if mem >= 0:  # RLIMIT_AS instead of RLIMIT_RSS, because Linux does not enforce the latter
+    resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+os.execvp(sys.argv[3], sys.argv[3:])
+"""
+
+
+def _limit_resources(cmd, cpu_limit, memory_limit):
+    """ Wraps a command so that it runs with resource limits.
+
+    The limits are inherited by all processes it starts, but each process
+    has its own CPU time, so the CPU time limit holds per notebook (kernel).
+    """
+    if cpu_limit is None and memory_limit is None:
+        return cmd
+
+    cpu = -1 if cpu_limit is None else cpu_limit
+    mem = -1 if memory_limit is None else memory_limit * 1024 ** 2
+    return [sys.executable, '-c', LIMIT_WRAPPER, str(cpu), str(mem)] + cmd
+
+
+def _exit_code(status):
+    """ Converts a wait status to a return code (negative if killed by a signal). """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _max_rss_mb(usage):
+    """ Converts the peak memory (ru_maxrss) from a resource usage to megabytes. """
+    # ru_maxrss is in kilobytes on Linux, but in bytes on Mac
+    return usage.ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def autograde_student(assignment, student, worker_db, timeout, notebook_timeout, force=False,
+                      cpu_limit=None, memory_limit=None):
+    """ Autogrades a single student's submission (in a separate process).
+
+    Parameters
+    ----------
+    assignment : str
+        Name of the assignment
+    student : str
+        Student ID
+    worker_db : str
+        Path to the gradebook copy this worker writes to
+    timeout : int
+        Maximum time (in seconds) that each cell is allowed to run
+    notebook_timeout : int
+        Maximum time (in seconds) for the entire submission
+    force : bool
+        Whether to overwrite existing autograded files
+    cpu_limit : int
+        Maximum CPU time (in seconds) of each notebook, or None for no limit
+    memory_limit : int
+        Maximum memory (in MB) of each notebook, or None for no limit
+
+    Returns
+    -------
+    ok : bool
+        Whether autograding succeeded
+    log : str
+        Output of `nbgrader autograde`
+    usage : dict
+        Status ('ok', 'failed', 'timeout' or 'killed'), wall time and CPU time
+        (in seconds) and peak memory (in MB) of the submission
+    """
+    cmd = [
+        'nbgrader', 'autograde', assignment,
+        f'--student={student}',
+        f'--db=sqlite:///{os.path.abspath(worker_db)}',
+        f'--ExecutePreprocessor.timeout={timeout}'
+    ]
+    if force:
+        cmd.append('--force')
+
+    # The submission gets its own process group, so that its kernels
+    # can be killed together with nbgrader when it runs out of time
+    t_start = time.time()
+    proc = subprocess.Popen(_limit_resources(cmd, cpu_limit, memory_limit),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                            start_new_session=True)
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    timer = threading.Timer(notebook_timeout, _kill)
+    timer.start()
+    try:
+        log = proc.stdout.read()
+        # Unlike `proc.wait`, `os.wait4` also returns the resource usage of the
+        # process, including that of the kernels it started (and waited for)
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        timer.cancel()
+        proc.stdout.close()
+
+    proc.returncode = _exit_code(status)
+    if timed_out.is_set():
+        state = 'timeout'
+        log = f'Timed out after {notebook_timeout} seconds\n{log}'
+    elif proc.returncode < 0:
+        state = 'killed'
+        log = f'Killed by signal {-proc.returncode} (resource limit?)\n{log}'
+    else:
+        state = 'ok' if proc.returncode == 0 else 'failed'
+
+    usage = {
+        'status': state,
+        'wall_time': time.time() - t_start,
+        'cpu_time': usage.ru_utime + usage.ru_stime,
+        'max_rss_mb': _max_rss_mb(usage)
+    }
+    return state == 'ok', log, usage
+
+
+def record_usage(db, assignment, usage):
+    """ Writes the resource usage of submissions to the gradebook (in a single transaction).
+
+    Parameters
+    ----------
+    db : str
+        Path to the gradebook
+    assignment : str
+        Name of the assignment
+    usage : dict
+        Resource usage (values; see `autograde_student`) per student ID (keys)
+    """
+    rows = [(assignment, student, u['status'], u['wall_time'], u['cpu_time'], u['max_rss_mb'])
+            for student, u in usage.items()]
+    with sqlite3.connect(db) as con:
+        con.execute(USAGE_TABLE)
+        con.executemany("INSERT OR REPLACE INTO resource_usage (assignment, student_id, status, "
+                        "wall_time, cpu_time, max_rss_mb) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    con.close()
+
+
+def merge_results(main_db, worker_db, assignment, students):
+    """ Merges the submissions of several students from a worker's gradebook
+    into the main gradebook in a single transaction.
+
+    Parameters
+    ----------
+    main_db : str
+        Path to the main gradebook
+    worker_db : str
+        Path to the worker's gradebook (a copy of the main gradebook)
+    assignment : str
+        Name of the assignment
+    students : list
+        Student IDs whose submissions should be merged
+    """
+    con = sqlite3.connect(main_db, isolation_level=None)
+    try:
+        con.execute('ATTACH DATABASE ? AS w', (worker_db,))
+        params = [assignment] + list(students)
+        marks = ', '.join('?' * len(students))
+        sub_query = ("SELECT id FROM {db}submitted_assignment WHERE assignment_id IN "
+                     "(SELECT id FROM assignment WHERE name = ?) "
+                     f"AND student_id IN ({marks})")
+        nb_query = f"SELECT id FROM {{db}}submitted_notebook WHERE assignment_id IN ({sub_query})"
+        where = {
+            'grade': f'notebook_id IN ({nb_query})',
+            'comment': f'notebook_id IN ({nb_query})',
+            'submitted_notebook': f'assignment_id IN ({sub_query})',
+            'submitted_assignment': f'id IN ({sub_query})'
+        }
+
+        con.execute('BEGIN')
+        con.execute(f'INSERT OR IGNORE INTO student SELECT * FROM w.student WHERE id IN ({marks})',
+                    students)
+        for table in SUBMISSION_TABLES:  # remove results of earlier runs
+            con.execute(f"DELETE FROM {table} WHERE {where[table].format(db='')}", params)
+
+        for table in SUBMISSION_TABLES[::-1]:
+            con.execute(f"INSERT INTO {table} SELECT * FROM w.{table} "
+                        f"WHERE {where[table].format(db='w.')}", params)
+        con.execute('COMMIT')
+    except sqlite3.Error:
+        if con.in_transaction:
+            con.execute('ROLLBACK')
+        raise
+    finally:
+        con.close()
+
+
+def main(assignment, workers=4, timeout=300, notebook_timeout=None, batch_size=20,
+         db='gradebook.db', force=False, cpu_limit=None, memory_limit=None, n_worst=5):
+    """ Autogrades all submissions of an assignment in parallel.
+
+    Parameters
+    ----------
+    assignment : str
+        Name of the assignment
+    workers : int
+        Number of submissions to autograde at the same time
+    timeout : int
+        Maximum time (in seconds) that each cell is allowed to run
+    notebook_timeout : int
+        Maximum time (in seconds) for each notebook; defaults to ten times `timeout`
+    batch_size : int
+        Number of graded submissions to write to the gradebook per transaction
+    db : str
+        Path to the gradebook
+    force : bool
+        Whether to overwrite existing autograded files
+    cpu_limit : int
+        Maximum CPU time (in seconds) of each notebook; defaults to `notebook_timeout`
+    memory_limit : int
+        Maximum memory (in MB) of each notebook, or None for no limit
+    n_worst : int
+        Number of submissions with the highest CPU time and memory to list
+
+    Returns
+    -------
+    failed : dict
+        Student IDs (keys) for which autograding failed and the corresponding log (values)
+    """
+    students = find_students(assignment)
+    if notebook_timeout is None:
+        notebook_timeout = timeout * 10
+
+    if cpu_limit is None:
+        cpu_limit = notebook_timeout
+
+    sub_timeout = notebook_timeout * count_notebooks(assignment)
+    print(f"Autograding {len(students)} submissions of {assignment} with {workers} workers ...")
+
+    tmp_dir = tempfile.mkdtemp(prefix='autograde_')
+    worker_dbs = [os.path.join(tmp_dir, f'gradebook_{i}.db') for i in range(workers)]
+    for worker_db in worker_dbs:
+        copy_gradebook(db, worker_db)
+
+    # Hand out the gradebook copies to the running jobs, so that
+    # no two jobs write to the same copy at the same time
+    free_dbs = list(worker_dbs)
+    pending = {worker_db: [] for worker_db in worker_dbs}
+    failed = {}
+    usage = {}
+    t_start = time.time()
+
+    def _run(student):
+        worker_db = free_dbs.pop()
+        try:
+            ok, log, used = autograde_student(assignment, student, worker_db, timeout,
+                                              sub_timeout, force, cpu_limit, memory_limit)
+        finally:
+            free_dbs.append(worker_db)
+        return student, worker_db, ok, log, used
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run, student) for student in students]
+            for i, future in enumerate(as_completed(futures)):
+                student, worker_db, ok, log, usage[student] = future.result()
+                print(f"[{i + 1}/{len(students)}] {student}: {'done' if ok else 'FAILED'} "
+                      f"({usage[student]['cpu_time']:.1f} s CPU, "
+                      f"{usage[student]['max_rss_mb']:.0f} MB)")
+                if not ok:
+                    failed[student] = log
+                    continue
+
+                pending[worker_db].append(student)
+                if len(pending[worker_db]) >= batch_size:
+                    merge_results(db, worker_db, assignment, pending[worker_db])
+                    pending[worker_db] = []
+
+        for worker_db, batch in pending.items():
+            if batch:
+                merge_results(db, worker_db, assignment, batch)
+    finally:
+        shutil.rmtree(tmp_dir)
+        if usage:
+            record_usage(db, assignment, usage)
+
+    print(f"Finished in {time.time() - t_start:.1f} seconds ({len(failed)} failed).")
+    for student in failed:
+        print(f"  - {student} ({usage[student]['status']})")
+
+    for key, label, unit in (('cpu_time', 'CPU time', 's'), ('max_rss_mb', 'memory', 'MB')):
+        worst = sorted(usage, key=lambda student: usage[student][key], reverse=True)[:n_worst]
+        if worst:
+            print(f"Highest {label}: " + ', '.join(f"{st} ({usage[st][key]:.1f} {unit})"
+                                                  for st in worst))
+
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Autogrades submissions in parallel.')
+    parser.add_argument('assignment', help='Name of the assignment (e.g., week_1)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of parallel workers')
+    parser.add_argument('--timeout', type=int, default=300,
+                        help='Maximum time (in seconds) per cell')
+    parser.add_argument('--notebook-timeout', type=int, default=None,
+                        help='Maximum time (in seconds) per notebook')
+    parser.add_argument('--batch-size', type=int, default=20,
+                        help='Number of submissions written to the gradebook per transaction')
+    parser.add_argument('--db', default='gradebook.db', help='Path to the gradebook')
+    parser.add_argument('--force', action='store_true',
+                        help='Overwrite existing autograded files')
+    parser.add_argument('--cpu-limit', type=int, default=None,
+                        help='Maximum CPU time (in seconds) per notebook (default: notebook timeout)')
+    parser.add_argument('--memory-limit', type=int, default=None,
+                        help='Maximum memory (in MB) per notebook (default: no limit)')
+    args = parser.parse_args()
+    failed = main(args.assignment, args.workers, args.timeout, args.notebook_timeout,
+                  args.batch_size, args.db, args.force, args.cpu_limit, args.memory_limit)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,166 @@
+""" Memory-mapped versions of the blood pressure data from the NumPy tutorial.
+
+In the NumPy tutorial, `bp_data` is an array with blood pressure measurements
+of shape (20, 24, 30, 2), i.e., subjects x hours x days x conditions, which
+easily fits in memory. Real monitoring data of this kind can be much larger
+than the available memory. The functions below store such arrays as `.npy`
+files that are memory-mapped: the data stay on disk and only the parts that
+are actually used are read. Indexing works as usual, e.g., `bp_data[:, :, 17, 1]`
+only reads the pages of the file that contain the selected values.
+
+Reductions (such as the mean per subject across hours) are computed in chunks
+along the first axis, so that only one chunk is in memory at a time:
+
+>>> from bp_data import create_bp_data, reduce
+>>> bp_data = create_bp_data('bp_data.npy', shape=(2000, 24, 30, 2))
+>>> mean_per_subject = reduce(bp_data, 'mean', axis=1)  # shape (2000, 30, 2)
+"""
+import numpy as np
+
+
+# The dimensions of the blood pressure data
+DIMS = ('subject', 'hour', 'day', 'condition')
+
+# The reductions supported by `reduce`
+REDUCTIONS = ('sum', 'mean', 'var', 'std', 'min', 'max')
+
+
+def _chunk_size(arr, max_bytes):
+    """ Returns the number of elements along the first axis that fit in `max_bytes`. """
+    row_bytes = max(arr[:1].nbytes, 1)
+    return max(1, int(max_bytes // row_bytes))
+
+
+def create_bp_data(fname, shape=(20, 24, 30, 2), loc=100, scale=5, seed=42, max_bytes=2 ** 26):
+    """ Generates random blood pressure data and stores it as a memory-mapped .npy file.
+
+    The data are generated in chunks (so never completely in memory), but are
+    identical to `np.random.RandomState(seed).normal(loc, scale, size=shape)`.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the .npy file
+    shape : tuple
+        Shape of the data (subjects, hours, days, conditions)
+    loc, scale : float
+        Mean and standard deviation of the data
+    seed : int
+        Seed of the random number generator
+    max_bytes : int
+        Maximum size (in bytes) of a chunk
+
+    Returns
+    -------
+    bp_data : numpy.memmap
+        The (read-only) memory-mapped data
+    """
+    bp_data = np.lib.format.open_memmap(fname, mode='w+', dtype=np.float64, shape=tuple(shape))
+    rs = np.random.RandomState(seed)
+    step = _chunk_size(bp_data, max_bytes)
+    for start in range(0, shape[0], step):
+        stop = min(start + step, shape[0])
+        bp_data[start:stop] = rs.normal(loc=loc, scale=scale, size=(stop - start,) + tuple(shape[1:]))
+
+    bp_data.flush()
+    del bp_data
+    return load_bp_data(fname)
+
+
+def load_bp_data(fname, mode='r'):
+    """ Loads blood pressure data from a .npy file as a memory-mapped array.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the .npy file
+    mode : str
+        'r' for read-only, 'r+' to allow changes (which are written to the file)
+        and 'c' to allow changes that are not written to the file
+
+    Returns
+    -------
+    bp_data : numpy.memmap
+        The memory-mapped data
+    """
+    return np.load(fname, mmap_mode=mode)
+
+
+def _combine(stats, chunk, func, axis):
+    """ Combines the running statistics with those of a new chunk. """
+    if func in ('sum', 'min', 'max'):
+        new = getattr(chunk, func)(axis=axis)
+        if stats is None:
+            return new
+        return {'sum': np.add, 'min': np.minimum, 'max': np.maximum}[func](stats, new)
+
+    # Count, mean and sum of squared deviations (combined as in Chan et al., 1979)
+    n = np.prod([chunk.shape[ax] for ax in axis])
+    mean = chunk.mean(axis=axis)
+    m2 = ((chunk - np.expand_dims(mean, axis)) ** 2).sum(axis=axis) if func in ('var', 'std') else None
+    if stats is None:
+        return n, mean, m2
+
+    n_a, mean_a, m2_a = stats
+    delta = mean - mean_a
+    n_ab = n_a + n
+    mean_ab = mean_a + delta * n / n_ab
+    m2_ab = m2_a + m2 + delta ** 2 * n_a * n / n_ab if m2 is not None else None
+    return n_ab, mean_ab, m2_ab
+
+
+def reduce(arr, func='mean', axis=None, ddof=0, max_bytes=2 ** 26):
+    """ Reduces a (memory-mapped) array along one or more axes, chunk by chunk.
+
+    The array is read in chunks along its first axis (the one that is
+    contiguous on disk). If the first axis is not reduced, each chunk is
+    reduced separately and the results are concatenated; otherwise, the
+    statistics of the chunks are combined.
+
+    Parameters
+    ----------
+    arr : numpy.ndarray
+        The (memory-mapped) array, e.g., from `load_bp_data`
+    func : str
+        Reduction ('sum', 'mean', 'var', 'std', 'min' or 'max')
+    axis : int, str, tuple or None
+        Axis or axes to reduce; can also be names from `DIMS` (e.g., 'hour');
+        None reduces all axes
+    ddof : int
+        Delta degrees of freedom (for 'var' and 'std')
+    max_bytes : int
+        Maximum size (in bytes) of a chunk
+
+    Returns
+    -------
+    result : numpy.ndarray or float
+        The reduced array (in memory)
+    """
+    if func not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction '{func}'; choose from {REDUCTIONS}!")
+
+    if axis is None:
+        axis = tuple(range(arr.ndim))
+    elif isinstance(axis, (int, str)):
+        axis = (axis,)
+
+    axis = tuple(sorted(DIMS.index(ax) if isinstance(ax, str) else ax % arr.ndim for ax in axis))
+    step = _chunk_size(arr, max_bytes)
+    chunks = (np.asarray(arr[start:start + step]) for start in range(0, arr.shape[0], step))
+
+    kwargs = {'ddof': ddof} if func in ('var', 'std') else {}
+    if 0 not in axis:  # each chunk gives part of the result
+        return np.concatenate([getattr(chunk, func)(axis=axis, **kwargs) for chunk in chunks])
+
+    stats = None
+    for chunk in chunks:
+        stats = _combine(stats, chunk, func, axis)
+
+    if func in ('sum', 'min', 'max'):
+        return stats
+
+    n, mean, m2 = stats
+    if func == 'mean':
+        return mean
+    var = m2 / (n - ddof)
+    return var if func == 'var' else np.sqrt(var)
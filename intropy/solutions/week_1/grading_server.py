@@ -0,0 +1,286 @@
+""" A local grading server that keeps the checkers of `grading.py` warm.
+
+Every client that uses `grading.py` directly first has to import numpy, the
+checkers and the reference answers, which takes much longer than grading a
+single answer. This module runs a single (asyncio) server process, on a
+Unix socket or a localhost port, that has all of these loaded already;
+clients send their answers over the socket and get the results back.
+
+Messages are framed by a 4-byte length. A request is a `.npz` archive with
+the name of the exercise and the submissions as `.npy` arrays (loaded
+without pickle, so a request cannot execute code on the server); answers
+that are not array-like (e.g., the nested lists of 'list_indexing') are sent
+as JSON. The response is a JSON object with the results of `grade_batch`.
+A client can send many requests (each with many submissions) over the same
+connection.
+
+Start the server with
+
+    python grading_server.py --socket /tmp/intropy_grading.sock
+
+and grade answers with
+
+>>> from grading_server import GradingClient
+>>> with GradingClient('/tmp/intropy_grading.sock') as client:
+...     results = client.grade('slicing_1', [[2, 3, 4, 5, 6], [2, 3, 4]])
+>>> [res.passed for res in results]
+[True, False]
+"""
+import io
+import os
+import json
+import socket
+import struct
+import asyncio
+import argparse
+import numpy as np
+from grading import EXERCISES, GradeResult, grade_batch
+from references import get_reference
+
+
+# Messages start with their length as a 4-byte unsigned integer (big-endian)
+HEADER = struct.Struct('!I')
+
+# Maximum size (in bytes) of a single message
+MAX_MESSAGE = 2 ** 30
+
+
+def _to_array(answer):
+    """ Converts an answer to an array that can be saved without pickle, or returns None. """
+    try:
+        arr = np.asarray(answer)
+    except (TypeError, ValueError):
+        return None
+
+    return None if arr.dtype == object else arr
+
+
+def encode_request(exercise, submissions):
+    """ Encodes the submissions to an exercise as a request (bytes).
+
+    Parameters
+    ----------
+    exercise : str
+        Name of the exercise (e.g., 'bloodpressure_index')
+    submissions : list
+        Submitted answers (or tuples of inputs and answer), like for `grade_batch`
+
+    Returns
+    -------
+    request : bytes
+        The encoded request (without the length)
+    """
+    arrays = {'exercise': np.array(exercise)}
+    for i, sub in enumerate(submissions):
+        elems = sub if isinstance(sub, tuple) else (sub,)
+        arrays[f'{i}.n'] = np.array(len(elems) if isinstance(sub, tuple) else -1)
+        for j, elem in enumerate(elems):
+            arr = _to_array(elem)
+            if arr is None:
+                arrays[f'{i}.{j}.json'] = np.array(json.dumps(elem))
+            else:
+                arrays[f'{i}.{j}'] = arr
+
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def decode_request(data):
+    """ Decodes a request (the inverse of `encode_request`).
+
+    Parameters
+    ----------
+    data : bytes
+        The encoded request
+
+    Returns
+    -------
+    exercise : str
+        Name of the exercise
+    submissions : list
+        The submissions (array-like answers as numpy arrays)
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        arrays = {key: npz[key] for key in npz.files}
+
+    submissions = []
+    i = 0
+    while f'{i}.n' in arrays:
+        n = int(arrays[f'{i}.n'])
+        elems = []
+        for j in range(max(n, 1)):
+            if f'{i}.{j}.json' in arrays:
+                elems.append(json.loads(str(arrays[f'{i}.{j}.json'])))
+            else:
+                elems.append(arrays[f'{i}.{j}'])
+        submissions.append(tuple(elems) if n >= 0 else elems[0])
+        i += 1
+
+    return str(arrays['exercise']), submissions
+
+
+def _to_json(obj):
+    """ Converts the numpy objects in the details of a GradeResult to JSON. """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.dtype):
+        return str(obj)
+    return repr(obj)
+
+
+async def _read_message(reader):
+    """ Reads a single message, or returns None if the connection is closed. """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE:
+        raise ValueError(f"Message of {size} bytes is too large (maximum: {MAX_MESSAGE})!")
+
+    return await reader.readexactly(size)
+
+
+def _write_message(writer, data):
+    writer.write(HEADER.pack(len(data)) + data)
+
+
+def handle_request(data):
+    """ Grades the submissions in a request and returns the (JSON-encoded) response. """
+    try:
+        exercise, submissions = decode_request(data)
+        results = grade_batch(exercise, submissions)
+    except Exception as e:  # e.g., an unknown exercise or a corrupt request
+        response = {'error': f'{type(e).__name__}: {e}'}
+    else:
+        response = {'results': [list(res) for res in results]}
+
+    return json.dumps(response, default=_to_json).encode()
+
+
+async def _serve_client(reader, writer):
+    """ Handles all requests of a single connection. """
+    try:
+        while True:
+            data = await _read_message(reader)
+            if data is None:
+                break
+            # Grading is fast and CPU-bound, so it is done in the event loop itself
+            _write_message(writer, handle_request(data))
+            await writer.drain()
+    except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(path=None, host='127.0.0.1', port=8765):
+    """ Runs the grading server until it is interrupted.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Unix socket; if None, the server listens on `host` and `port`
+    host : str
+        Host to listen on (only used without `path`)
+    port : int
+        Port to listen on (only used without `path`)
+    """
+    for name, exercise in EXERCISES.items():  # load the reference answers only once
+        if exercise.reference is None and exercise.check is None:
+            get_reference(name)
+
+    if path is not None:
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(_serve_client, path)
+    else:
+        server = await asyncio.start_server(_serve_client, host, port)
+
+    address = path or f'{host}:{port}'
+    print(f"Grading server listening on {address} (press Ctrl+C to stop) ...")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+class GradingClient:
+    """ Client of the grading server (a single, reusable connection).
+
+    Parameters
+    ----------
+    path : str
+        Path of the Unix socket of the server; if None, `host` and `port` are used
+    host : str
+        Host of the server
+    port : int
+        Port of the server
+    """
+    def __init__(self, path=None, host='127.0.0.1', port=8765):
+        """ Initializes a GradingClient object and connects to the server. """
+        if path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(path)
+        else:
+            self._sock = socket.create_connection((host, port))
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _recv(self, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = self._sock.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("The grading server closed the connection!")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def grade(self, exercise, submissions):
+        """ Grades many submissions to a single exercise (see `grading.grade_batch`).
+
+        Parameters
+        ----------
+        exercise : str
+            Name of the exercise (e.g., 'bloodpressure_index')
+        submissions : list
+            Submitted answers (or tuples of inputs and answer)
+
+        Returns
+        -------
+        results : list of GradeResult
+            One result per submission (the details in `diff` are converted to JSON)
+        """
+        data = encode_request(exercise, submissions)
+        self._sock.sendall(HEADER.pack(len(data)) + data)
+        (size,) = HEADER.unpack(self._recv(HEADER.size))
+        response = json.loads(self._recv(size))
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+        return [GradeResult(*res) for res in response['results']]
+
+    def close(self):
+        """ Closes the connection. """
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs a local grading server.')
+    parser.add_argument('--socket', default=None, help='Path of the Unix socket')
+    parser.add_argument('--host', default='127.0.0.1', help='Host (if no socket is given)')
+    parser.add_argument('--port', type=int, default=8765, help='Port (if no socket is given)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,188 @@
+""" Online (streaming) statistics, generalizing `example_module.average`.
+
+`example_module.average(arg1, arg2)` computes the average of exactly two
+numbers, and in the exercises we compute means like `sum(z1) / len(z1)`,
+which needs the complete list in memory. The classes below instead update
+the mean, variance and covariance with one value (or one batch of values)
+at a time, using Welford's algorithm, which is numerically stable and runs
+in constant memory, also for streams (e.g., generators) of millions of values.
+NumPy arrays are handled in one vectorized step: the statistics of the whole
+array are computed at once and then combined with the running statistics.
+
+>>> from example_module import average
+>>> from online_stats import OnlineStats, mean
+>>> mean([1, 3]) == average(1, 3)
+True
+>>> stats = OnlineStats()
+>>> stats.update(x ** 2 for x in range(1_000_000))  # never in memory as a whole
+>>> stats.n
+1000000
+
+Like NumPy, the statistics of an empty stream are NaN:
+
+>>> mean([]), var([]), cov([], [])
+(nan, nan, nan)
+"""
+from itertools import islice, zip_longest
+import numpy as np
+
+
+# Number of values from an iterable (or generator) that are converted to an array at once
+CHUNK_SIZE = 2 ** 16
+
+
+def _chunks(values):
+    """ Yields arrays of at most CHUNK_SIZE values from an iterable. """
+    it = iter(values)
+    while True:
+        chunk = np.fromiter(islice(it, CHUNK_SIZE), dtype=float)
+        if not chunk.size:
+            return
+        yield chunk
+
+
+class OnlineStats:
+    """ Running count, mean and variance of a stream of values.
+
+    Parameters
+    ----------
+    values : int/float, iterable or numpy.ndarray
+        Initial values (optional)
+    """
+    def __init__(self, values=None):
+        """ Initializes an OnlineStats object. """
+        self.n = 0
+        self._mean = 0.0
+        self._m2 = 0.0  # sum of squared deviations from the mean
+        if values is not None:
+            self.update(values)
+
+    @property
+    def mean(self):
+        """ The mean (NaN if there are no values yet, like `np.mean`). """
+        return self._mean if self.n else np.nan
+
+    def _combine(self, n, mean, m2):
+        """ Combines the statistics with those of another batch (Chan et al., 1979). """
+        n_ab = self.n + n
+        delta = mean - self._mean
+        self._mean += delta * n / n_ab
+        self._m2 += m2 + delta ** 2 * self.n * n / n_ab
+        self.n = n_ab
+
+    def update(self, values):
+        """ Updates the statistics with a single value or many values.
+
+        Parameters
+        ----------
+        values : int/float, iterable or numpy.ndarray
+            A number, an iterable/generator of numbers or an array
+            (of which all elements are used)
+        """
+        if np.isscalar(values):  # Welford's update
+            self.n += 1
+            delta = values - self._mean
+            self._mean += delta / self.n
+            self._m2 += delta * (values - self._mean)
+        elif isinstance(values, np.ndarray):  # all values at once
+            if values.size:
+                mean = float(values.mean())
+                self._combine(values.size, mean, float(((values - mean) ** 2).sum()))
+        else:
+            for chunk in _chunks(values):
+                self.update(chunk)
+
+    def merge(self, other):
+        """ Adds the statistics of another OnlineStats object (e.g., of another stream). """
+        if other.n:
+            self._combine(other.n, other._mean, other._m2)
+
+    def var(self, ddof=0):
+        """ Returns the variance (with `ddof` delta degrees of freedom, like `np.var`). """
+        return self._m2 / (self.n - ddof) if self.n > ddof else np.nan
+
+    def std(self, ddof=0):
+        """ Returns the standard deviation (with `ddof` delta degrees of freedom, like `np.std`). """
+        return np.sqrt(self.var(ddof))
+
+
+class OnlineCovariance:
+    """ Running means and covariance of a stream of pairs of values.
+
+    Parameters
+    ----------
+    x, y : int/float, iterable or numpy.ndarray
+        Initial values (optional; of equal length)
+    """
+    def __init__(self, x=None, y=None):
+        """ Initializes an OnlineCovariance object. """
+        self.n = 0
+        self._mean_x = 0.0
+        self._mean_y = 0.0
+        self._c = 0.0  # sum of the products of the deviations from the means
+        if x is not None:
+            self.update(x, y)
+
+    @property
+    def mean_x(self):
+        """ The mean of x (NaN if there are no values yet). """
+        return self._mean_x if self.n else np.nan
+
+    @property
+    def mean_y(self):
+        """ The mean of y (NaN if there are no values yet). """
+        return self._mean_y if self.n else np.nan
+
+    def _combine(self, n, mean_x, mean_y, c):
+        """ Combines the statistics with those of another batch. """
+        n_ab = self.n + n
+        dx, dy = mean_x - self._mean_x, mean_y - self._mean_y
+        self._c += c + dx * dy * self.n * n / n_ab
+        self._mean_x += dx * n / n_ab
+        self._mean_y += dy * n / n_ab
+        self.n = n_ab
+
+    def update(self, x, y):
+        """ Updates the statistics with a single pair or many pairs of values.
+
+        Parameters
+        ----------
+        x, y : int/float, iterable or numpy.ndarray
+            Numbers, iterables/generators of numbers or arrays (of equal length)
+        """
+        if np.isscalar(x):  # Welford's update
+            self.n += 1
+            dx = x - self._mean_x
+            self._mean_x += dx / self.n
+            self._mean_y += (y - self._mean_y) / self.n
+            self._c += dx * (y - self._mean_y)
+        elif isinstance(x, np.ndarray) and isinstance(y, np.ndarray):
+            if x.shape != y.shape:
+                raise ValueError(f"x and y have different shapes ({x.shape} and {y.shape})!")
+            if x.size:
+                mx, my = float(x.mean()), float(y.mean())
+                self._combine(x.size, mx, my, float(((x - mx) * (y - my)).sum()))
+        else:
+            for x_chunk, y_chunk in zip_longest(_chunks(x), _chunks(y)):
+                if x_chunk is None or y_chunk is None or x_chunk.size != y_chunk.size:
+                    raise ValueError("x and y have different lengths!")
+                self.update(x_chunk, y_chunk)
+
+    def cov(self, ddof=1):
+        """ Returns the covariance (with `ddof` delta degrees of freedom, like `np.cov`). """
+        return self._c / (self.n - ddof) if self.n > ddof else np.nan
+
+
+def mean(values):
+    """ Computes the mean of a number, an iterable (e.g., a generator) or an array. """
+    return OnlineStats(values).mean
+
+
+def var(values, ddof=0):
+    """ Computes the variance of a number, an iterable (e.g., a generator) or an array. """
+    return OnlineStats(values).var(ddof)
+
+
+def cov(x, y, ddof=1):
+    """ Computes the covariance of two iterables (e.g., generators) or arrays. """
+    return OnlineCovariance(x, y).cov(ddof)
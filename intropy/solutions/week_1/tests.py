@@ -1,186 +1,405 @@
+import io
+import timeit
+import reprlib
+import warnings
+import functools
+import contextlib
 import numpy as np
+from memo import LRUCache, answer_key
+from references import get_reference
 
+
+# At most this many differing elements are listed when an answer is incorrect
+MAX_SHOWN = 5
+
+# Answers with at most this many elements are also shown completely
+MAX_PRINTED = 25
+
+# Short representations of (possibly huge) answers that are not arrays
+_repr = reprlib.Repr()
+_repr.maxstring = _repr.maxother = 80
+
+
+def _show(value):
+    """ Returns a short representation of a single element (as a Python object). """
+    return _repr.repr(value.item() if isinstance(value, np.generic) else value)
+
+
+def diff_report(answer, c_answer, decimal=None, k=MAX_SHOWN):
+    """ Describes how an answer differs from the correct answer.
+
+    The comparison itself is vectorized and the length of the report does not
+    depend on the size of the answer: it contains the shape and dtype (when
+    they differ), the number of differing elements, the maximum absolute error
+    and the first `k` differing elements; only small answers are shown completely.
+
+    Parameters
+    ----------
+    answer : object
+        The student's answer (e.g., a numpy array, list or number)
+    c_answer : object
+        The correct answer
+    decimal : int
+        Numbers are equal when they differ less than 1.5 * 10 ** -decimal
+        (like `np.testing.assert_array_almost_equal`); None means exactly equal
+    k : int
+        Maximum number of differing elements to list
+
+    Returns
+    -------
+    report : str or None
+        The report, or None if the answer is correct
+
+    Examples
+    --------
+    >>> diff_report([[1, 2], [3]], [[1, 2], [3]]) is None
+    True
+    >>> print(diff_report([[1, 2], [3]], np.ones((2, 2))))
+    I got [[1, 2], [3]] (with elements of unequal length), but I expected an array of shape (2, 2)
+    >>> test_fill_array_with_complement([[1, 2], [3]])  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    tests.IncorrectAnswer: I got [[1, 2], [3]] (with elements of unequal length), but I expected ...
+    """
+    try:
+        arr, c_arr = np.asarray(answer), np.asarray(c_answer)
+    except ValueError:  # e.g., nested lists of unequal lengths
+        try:
+            equal = bool(answer == c_answer)
+        except (TypeError, ValueError):  # e.g., compared to an array
+            equal = False
+
+        if equal:
+            return None
+
+        if isinstance(c_answer, np.ndarray):
+            expected = "an array of shape %r" % (c_answer.shape,)
+        else:
+            expected = _repr.repr(c_answer)
+        return "I got %s (with elements of unequal length), but I expected %s" % (
+            _repr.repr(answer), expected)
+
+    lines = []
+    if arr.shape != c_arr.shape:
+        lines.append("shape: I got %r, but I expected %r" % (arr.shape, c_arr.shape))
+    if arr.dtype.kind != c_arr.dtype.kind:
+        lines.append("dtype: I got %s, but I expected %s" % (arr.dtype, c_arr.dtype))
+
+    if arr.shape == c_arr.shape:
+        numeric = arr.dtype.kind in 'biufc' and c_arr.dtype.kind in 'biufc'
+        if numeric:
+            dtype = np.result_type(arr, c_arr, float)  # also subtracts booleans
+            err = np.abs(arr.astype(dtype) - c_arr.astype(dtype))
+            both_nan = np.isnan(arr.astype(dtype)) & np.isnan(c_arr.astype(dtype))
+            if decimal is None:
+                mismatch = ~((arr == c_arr) | both_nan)
+            else:
+                mismatch = ~((err < 1.5 * 10.0 ** -decimal) | both_nan)
+        elif arr.dtype.kind == c_arr.dtype.kind:
+            mismatch = np.asarray(arr != c_arr, dtype=bool).reshape(arr.shape)
+        else:  # e.g., numbers instead of strings
+            mismatch = np.ones(arr.shape, dtype=bool)
+
+        n_mismatch = int(mismatch.sum())
+        if not n_mismatch:  # a different (numeric) dtype alone is fine
+            return None
+
+        line = "%i of %i elements differ" % (n_mismatch, mismatch.size)
+        if numeric:
+            line += " (max. absolute error: %.6g)" % np.nanmax(np.where(mismatch, err, np.nan).real)
+        lines.append(line)
+        for flat in np.flatnonzero(mismatch)[:k]:
+            idx = np.unravel_index(flat, arr.shape)
+            lines.append("  at %s: I got %s, but I expected %s" % (
+                list(int(i) for i in idx), _show(arr[idx]), _show(c_arr[idx])))
+        if n_mismatch > k:
+            lines.append("  ... (%i more)" % (n_mismatch - k))
+
+    if arr.size <= MAX_PRINTED and c_arr.size <= MAX_PRINTED:
+        lines.append("Your answer:\n%r\nThe correct answer:\n%r" % (answer, c_answer))
+
+    return "\n".join(lines)
+
+
+class IncorrectAnswer(AssertionError):
+    """ Raised when a student's answer does not match the correct answer.
+
+    The memoized checkers (see `memoize`) only store its message, so the errors
+    they raise have None as `answer` and `c_answer`.
+    """
+    def __init__(self, answer, c_answer, report=None):
+        self.answer = answer
+        self.c_answer = c_answer
+        if report is None:
+            report = diff_report(answer, c_answer) or "I got %s, but I expected %s" % (
+                _repr.repr(answer), _repr.repr(c_answer))
+        super().__init__(report)
+
+
+def check_answer(answer, c_answer, decimal=None, msg=None):
+    """ Raises an IncorrectAnswer (after printing `msg`) if the answer is incorrect. """
+    report = diff_report(answer, c_answer, decimal)
+    if report is not None:
+        if msg is not None:
+            print(msg)
+        raise IncorrectAnswer(answer, c_answer, report)
+
+
+class TooSlow(AssertionError):
+    """ Raised when a student's function is much slower than the reference function. """
+    pass
+
+
+# Thresholds of the performance checks per exercise (see `check_performance`)
+PERFORMANCE = {
+    'compute_range_vectorized': dict(max_slowdown=10, max_exponent=1.5, action='raise')
+}
+
+
+def _median_time(func, arg, repeats=5, warmup=1, min_time=0.005):
+    """ Returns the median time (in seconds) of a single call of `func(arg)`.
+
+    The function is first called `warmup` times (e.g., to fill caches); then,
+    the number of calls per repeat is increased until one repeat takes at least
+    `min_time` seconds, so that very fast functions can be timed reliably.
+    """
+    for _ in range(warmup):
+        func(arg)
+
+    timer = timeit.Timer(lambda: func(arg))
+    number = 1
+    while timer.timeit(number) < min_time and number < 10 ** 6:
+        number *= 10
+
+    return np.median(timer.repeat(repeats, number)) / number
+
+
+def check_performance(func, c_func, inputs, max_slowdown=10, max_exponent=1.5, action='raise',
+                      repeats=5, warmup=1):
+    """ Checks whether a function is not much slower than the reference function.
+
+    Both functions are timed on inputs of increasing size. The function fails
+    the check when it is more than `max_slowdown` times slower than the
+    reference on the largest input, or when its time grows faster with the
+    size of the input than `size ** max_exponent` (e.g., a Python loop over
+    all pairs of elements instead of a single vectorized operation).
+
+    Parameters
+    ----------
+    func : callable
+        The student's function (with a single argument)
+    c_func : callable
+        The reference function
+    inputs : list
+        Inputs of increasing size (e.g., arrays)
+    max_slowdown : float
+        Maximum ratio of the time of `func` and the time of `c_func`
+    max_exponent : float
+        Maximum exponent of the growth of the time with the size of the input
+        (1 means linear); None to skip this check
+    action : str
+        'raise' to raise a TooSlow error or 'warn' to only give a warning
+    repeats : int
+        Number of times each function is timed per input (the median is used)
+    warmup : int
+        Number of calls before timing each function
+
+    Returns
+    -------
+    times : numpy.ndarray
+        Times (in seconds) of `func` (first column) and `c_func` (second column) per input
+    """
+    times = np.array([[_median_time(f, inp, repeats, warmup) for f in (func, c_func)]
+                      for inp in inputs])
+    sizes = np.array([np.size(inp) for inp in inputs], dtype=float)
+
+    problems = []
+    slowdown = times[-1, 0] / times[-1, 1]
+    if slowdown > max_slowdown:
+        problems.append("Your function is %.1f times slower than the reference solution "
+                        "(the maximum is %g)!" % (slowdown, max_slowdown))
+
+    if max_exponent is not None and len(inputs) > 1:
+        # Slope of log(time) against log(size)
+        exponent = np.polyfit(np.log(sizes), np.log(times[:, 0]), 1)[0]
+        if exponent > max_exponent:
+            problems.append("The time of your function grows with the size of the input "
+                            "to the power %.2f (the maximum is %g)!" % (exponent, max_exponent))
+
+    if problems:
+        msg = "\n".join(problems) + " Did you vectorize your function?"
+        if action == 'raise':
+            raise TooSlow(msg)
+        warnings.warn(msg)
+
+    return times
+
+
+# Feedback (printed output and error message) on earlier answers, per checker and answer
+FEEDBACK = LRUCache(maxsize=4096, maxbytes=2 ** 24)
+
+
+def memoize(checker):
+    """ Memoizes the feedback of a checker on identical answers.
+
+    The first time an answer is checked, the printed feedback and the error
+    message (if the answer is incorrect) are stored in `FEEDBACK`; when the same
+    answer is checked again, they are replayed (with a new error), which only
+    costs a hash lookup. Only text is stored, not the answers themselves. Calls
+    with keyword arguments, callables (e.g., a function to time) or answers
+    that cannot be hashed exactly (see `answer_key`) are not memoized.
+    """
+    @functools.wraps(checker)
+    def wrapper(*args, **kwargs):
+        if kwargs or any(callable(arg) for arg in args):
+            return checker(*args, **kwargs)
+
+        key = answer_key(checker.__name__, *args)
+        if key is None:  # e.g., a DataFrame, which cannot be hashed exactly
+            return checker(*args)
+
+        feedback = FEEDBACK.get(key)
+        if feedback is None:
+            out, error_type, message = io.StringIO(), None, None
+            try:
+                with contextlib.redirect_stdout(out):
+                    checker(*args)
+            except AssertionError as e:
+                error_type, message = type(e), str(e)
+            except Exception:  # e.g., an answer of the wrong type, which is not memoized
+                print(out.getvalue(), end='')
+                raise
+            feedback = (out.getvalue(), error_type, message)
+            FEEDBACK.put(key, feedback, nbytes=len(feedback[0]) + len(message or ''))
+
+        output, error_type, message = feedback
+        print(output, end='')
+        if error_type is IncorrectAnswer:
+            raise IncorrectAnswer(None, None, message)
+        if error_type is not None:
+            raise error_type(message)
+
+    return wrapper
+
+
+@memoize
 def test_list_indexing(todo_list):
     
-    try:
-        assert(todo_list[2] == 'REPLACED')
-    except AssertionError as e:
-        print("The element 'TO_REPLACE_1' is not correctly replaced!")
-        raise(e)
- 
-    try:
-        assert(todo_list[-1][-1][-1] == 'REPLACED')
-    except AssertionError as e:
-        print("The element 'TO_REPLACE_2' is not correctly replaced!")
-        raise(e)
-   
+    check_answer(todo_list[2], 'REPLACED', msg="The element 'TO_REPLACE_1' is not correctly replaced!")
+    check_answer(todo_list[-1][-1][-1], 'REPLACED', msg="The element 'TO_REPLACE_2' is not correctly replaced!")
     print('Well done!')
 
 
+@memoize
 def test_slicing_1(lst):
     
-    c_answer = [2, 3, 4, 5, 6]
-    try:
-        assert(lst == c_answer)
-    except AssertionError:
-        print('The slice is incorrect!')
-        raise IncorrectAnswer(lst, c_answer)
-    else:
-        print("Well done!")
+    c_answer = get_reference('slicing_1')
+    check_answer(lst, c_answer, msg='The slice is incorrect!')
+    print("Well done!")
 
 
+@memoize
 def test_slicing_2(lst):
     
-    c_answer = [5, 7, 9, 11]
-    
-    try:
-        assert(lst == c_answer)
-    except AssertionError:
-        print('The slice is incorrect!')
-        raise IncorrectAnswer(lst, c_answer)
-    else:
-        print("Well done!")
+    c_answer = get_reference('slicing_2')
+    check_answer(lst, c_answer, msg='The slice is incorrect!')
+    print("Well done!")
 
         
+@memoize
 def test_create_array_with_zeros(arr):
     
-    c_answer = np.zeros((2, 3, 5, 3, 7))
-    try:
-        assert(np.all(arr.shape == c_answer.shape))
-    except AssertionError as e:
-        print("Your array has the wrong shape, namely %r, but I expected %r" % (arr.shape, c_answer.shape,))
-        raise(e)
-
-    try:
-        assert(np.all(arr == 0.0))
-    except AssertionError as e:
-        print("Your array does not contain zeros ... Did you use np.zeros()?")
-        raise(e)
+    c_answer = get_reference('create_array_with_zeros')
+    if np.shape(arr) != c_answer.shape:
+        print("Your array has the wrong shape, namely %r, but I expected %r" % (np.shape(arr), c_answer.shape,))
+        raise IncorrectAnswer(arr, c_answer)
 
+    check_answer(arr, c_answer, msg="Your array does not contain zeros ... Did you use np.zeros()?")
     print("Well done!")
 
     
+@memoize
 def test_fill_array_with_complement(arr):
     
-    c_answer = 1.0 / np.arange(1, 9)
-    try:
-        np.testing.assert_array_almost_equal(arr, c_answer, 4)
-    except AssertionError as e:
-        print("Your array (%r) does not match the correct answer (%r)!" % (arr, c_answer))
-        raise(e)
-    else:
-        print("AWESOME!")
+    c_answer = get_reference('fill_array_with_complement')
+    check_answer(arr, c_answer, 4, msg="Your array does not match the correct answer!")
+    print("AWESOME!")
 
 
+@memoize
 def test_set_odd_indices_to_zero(arr):
     
-    c_answer = np.arange(3, 25)
-    c_answer[1::2] = 0.0
-    
-    try:
-        np.testing.assert_array_almost_equal(arr, c_answer, 4)
-    except AssertionError as e:
-        print("Your array (%r) does not match the correct answer (%r)!" % (arr, c_answer))
-        raise(e)
-    else:
-        print("Good job!")
+    c_answer = get_reference('set_odd_indices_to_zero')
+    check_answer(arr, c_answer, 4, msg="Your array does not match the correct answer!")
+    print("Good job!")
 
 
+@memoize
 def test_set_lower_right_value_to_one(arr):
     
-    c_answer = np.zeros((3, 3))
-    c_answer[-1, -1] = 1.0
-    
-    try:
-        np.testing.assert_array_almost_equal(arr, c_answer, 4)
-    except AssertionError as e:
-        print("Your array: \n\n%r\n\ndoes not match the correct answer:\n\n%r!" % (arr, c_answer))
-        raise(e)
-    else:
-        print("Superb!")
+    c_answer = get_reference('set_lower_right_value_to_one')
+    check_answer(arr, c_answer, 4, msg="Your array does not match the correct answer!")
+    print("Superb!")
 
 
+@memoize
 def test_bloodpressure_index(arr):
 
-    np.random.seed(42)
-    bp_data = np.random.normal(loc=100, scale=5, size=(20, 24, 30, 2))
-    c_answer = bp_data[:, :, 17, 1]
-
-    try:
-        assert(arr.shape == (20, 24))
-    except AssertionError as e:
+    c_answer = get_reference('bloodpressure_index')
+    if np.shape(arr) != (20, 24):
         print("The result of your indexing operation is of shape %r, "
-              "while it should be %r, namely 20 subjects by 24 hours"  % (arr.shape, (20, 24)))
-        raise(e)
+              "while it should be %r, namely 20 subjects by 24 hours"  % (np.shape(arr), (20, 24)))
+        raise IncorrectAnswer(arr, c_answer)
 
-    try:
-        np.testing.assert_array_almost_equal(arr, c_answer, 4)
-    except AssertionError as e:
-        print("Your answer is not correct! Did you perhaps forget that Python has zero-based indexing? (First index is 0!)")
-        raise(e)
-    
+    check_answer(arr, c_answer, 4, msg="Your answer is not correct! Did you perhaps forget that "
+                                       "Python has zero-based indexing? (First index is 0!)")
     print("You're incredible!")
 
 
+@memoize
 def test_boolean_indexing(arr):
     
-    my_array = np.array([[0, 1, -1, -2],
-                     [2, -5, 1, 4],
-                     [10, -2, -4, 20]])
-    c_answer = my_array[my_array ** 2 > 4]
-    
-    try:
-        np.testing.assert_array_equal(arr, c_answer)
-    except AssertionError as e:
-        print("Incorrect answer! I expected %r, but I got %r" % (c_answer, arr))
-        raise(e)
-    
+    c_answer = get_reference('boolean_indexing')
+    check_answer(arr, c_answer, msg="Incorrect answer!")
     print("EPIC!")
     
 
+@memoize
 def test_tvalue_computation(arr, h0, tval_ans):
     
     c_tval = (arr.mean() - h0) / (arr.std() / np.sqrt(arr.size - 1))
-    
-    try:
-        np.testing.assert_almost_equal(tval_ans, c_tval)
-    except AssertionError as e:
-        print("T-value is incorrect! Your t-value is %.3f, while it should be %.3f" % (tval_ans, c_tval))
-        raise(e)
-    
+    check_answer(tval_ans, c_tval, 7, msg="T-value is incorrect! Your t-value is %.3f, "
+                                          "while it should be %.3f" % (tval_ans, c_tval))
     print("Correct! You stats wizard!")
 
     
+@memoize
 def test_array_product_and_sum(arr):
     
-    arr_A = np.arange(10).reshape((5, 2))
-    arr_B = np.arange(10, 20).reshape((5, 2))
-    c_answer = (arr_A * arr_B) + 5
-
-    try:
-        np.testing.assert_array_equal(arr, c_answer)
-    except AssertionError as e:
-        print("Your answer is incorrect! I got:\n\n%r\n\nbut I expected:\n\n%r" % (arr, c_answer))
-        raise(e)
-    else:
-        print("Great!")
+    c_answer = get_reference('array_product_and_sum')
+    check_answer(arr, c_answer, msg="Your answer is incorrect!")
+    print("Great!")
         
 
-def test_compute_range_vectorized(arr, ans):
-    
+@memoize
+def test_compute_range_vectorized(arr, ans, func=None, **kwargs):
+    """ Checks the answer of the `compute_range_vectorized` exercise.
+
+    When the student's function is given as `func`, it is also checked for
+    speed (on copies of `arr` with up to 64 times as many columns, which is
+    where a Python loop over the columns is slow); `kwargs` override the
+    thresholds from `PERFORMANCE` (see `check_performance`).
+    """
     c_answer = arr.max(axis=0) - arr.min(axis=0)
-    
-    try:
-        assert(ans.shape == c_answer.shape)
-    except AssertionError as e:
+    if np.shape(ans) != c_answer.shape:
         print("The shape of your answer is incorrect! I got %r, "
-              "but I expected %r for input-array of shape %r" % (ans.shape, c_answer.shape, arr.shape))
-        raise(e)
-    
-    try:
-        np.testing.assert_array_almost_equal(ans, c_answer, 4)
-    except AssertionError as e:
-        print("Your answer is incorrect! Your answer is:\n\n%r/n/n But I expected:\n\n%r" % (ans, c_answer))
-        raise(e)
-    
-    print("Easy peasy!")
\ No newline at end of file
+              "but I expected %r for input-array of shape %r" % (np.shape(ans), c_answer.shape, arr.shape))
+        raise IncorrectAnswer(ans, c_answer)
+
+    check_answer(ans, c_answer, 4, msg="Your answer is incorrect!")
+    if func is not None:
+        inputs = [np.tile(arr, (1, factor)) for factor in (1, 4, 16, 64)]
+        check_performance(func, lambda a: a.max(axis=0) - a.min(axis=0), inputs,
+                          **{**PERFORMANCE['compute_range_vectorized'], **kwargs})
+
+    print("Easy peasy!")
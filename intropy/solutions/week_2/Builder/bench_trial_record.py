@@ -0,0 +1,33 @@
+""" Micro-benchmark of exec-based parameter unpacking versus trial records.
+
+Compares the per-trial cost of the Builder's default approach (running
+`exec` for every parameter) with creating a record of the class made by
+`make_trial_record`. Does not need PsychoPy; run it as:
+
+    python bench_trial_record.py
+"""
+import timeit
+import pandas as pd
+from trial_record import make_trial_record
+
+
+def unpack_exec(thisTrial_loop):
+    """ The Builder's approach (with a dict standing in for the module globals). """
+    namespace = {'thisTrial_loop': thisTrial_loop}
+    for paramName in thisTrial_loop:
+        namespace['paramName'] = paramName
+        exec('{} = thisTrial_loop[paramName]'.format(paramName), namespace)
+    return namespace
+
+
+if __name__ == '__main__':
+    conditions = pd.read_excel('conditions.xlsx').to_dict('records')
+    Trial = make_trial_record(conditions)
+    n = 10000
+
+    reps = n // len(conditions)
+    t_exec = min(timeit.repeat(lambda: [unpack_exec(c) for c in conditions], number=reps, repeat=5))
+    t_record = min(timeit.repeat(lambda: [Trial(**c) for c in conditions], number=reps, repeat=5))
+    n = reps * len(conditions)
+    print(f"exec:   {t_exec / n * 1e6:.2f} us per trial")
+    print(f"record: {t_record / n * 1e6:.2f} us per trial ({t_exec / t_record:.0f} times faster)")
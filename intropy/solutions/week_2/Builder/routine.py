@@ -0,0 +1,120 @@
+""" Bookkeeping of the routines (and their components) of stroop.py.
+
+On every frame, the Builder's code scans all components of a routine
+(`hasattr(thisComponent, "status")`) to find out whether the routine has
+finished and asks the window twice for the time of the next flip (once on
+the routine's clock and once on the global clock). The `Routine` below
+instead keeps a counter of the components that did not finish yet (updated
+whenever a component finishes) and predicts the next flip only once per frame,
+so that the Python work per frame no longer grows with the number of
+components. It also measures this work (the time between the start of a
+frame and the flip), so we know how much of the frame budget is left for drawing.
+"""
+import time
+from psychopy import logging
+from psychopy.constants import NOT_STARTED, FINISHED
+
+
+class Routine:
+    """ Keeps track of the state of the components of a single routine.
+
+    Parameters
+    ----------
+    name : str
+        Name of the routine
+    win : psychopy.visual.Window
+        Window of the experiment
+    clock : psychopy.core.Clock
+        Clock of the routine
+    components : list
+        Components (stimuli, keyboards, etc.) of the routine
+    """
+    def __init__(self, name, win, clock, components):
+        """ Initializes a Routine object. """
+        self.name = name
+        self.win = win
+        self.clock = clock
+        self.components = components
+        # Checked once here instead of on every frame
+        self._tracked = [comp for comp in components if hasattr(comp, 'status')]
+        self._drawable = [comp for comp in components if hasattr(comp, 'setAutoDraw')]
+        self.n_unfinished = len(self._tracked)
+        self.frameN = -1
+        # Python time per frame of the current run (a running sum and maximum)
+        self.n_flips = 0
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+        self._offset = 0
+        self._t_frame = None
+
+    def reset(self):
+        """ Prepares the routine (and its components) for a new run. """
+        for comp in self.components:
+            comp.tStart = None
+            comp.tStop = None
+            comp.tStartRefresh = None
+            comp.tStopRefresh = None
+
+        for comp in self._tracked:
+            comp.status = NOT_STARTED
+
+        self.n_unfinished = len(self._tracked)
+        self.frameN = -1
+        self.n_flips = 0
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+        _timeToFirstFrame = self.win.getFutureFlipTime(clock="now")
+        self.clock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
+        # Difference between the global clock and the routine's clock, which
+        # converts a flip time on the global clock to one on the routine's clock
+        self._offset = logging.defaultClock.getLastResetTime() - self.clock.getLastResetTime()
+
+    def next_frame(self):
+        """ Starts a new frame.
+
+        Returns
+        -------
+        t : float
+            Current time on the routine's clock
+        tThisFlip : float
+            Predicted time of the next flip on the routine's clock
+        tThisFlipGlobal : float
+            Predicted time of the next flip on the global clock
+        frameN : int
+            Number of completed frames (so 0 is the first frame)
+        """
+        self._t_frame = time.perf_counter()
+        self.frameN += 1
+        t = self.clock.getTime()
+        tThisFlipGlobal = self.win.getFutureFlipTime(clock=None)
+        return t, tThisFlipGlobal + self._offset, tThisFlipGlobal, self.frameN
+
+    def finish(self, comp):
+        """ Stops a component (and updates the number of unfinished components). """
+        if comp.status == FINISHED:
+            return
+
+        if hasattr(comp, 'setAutoDraw'):
+            comp.setAutoDraw(False)
+
+        comp.status = FINISHED
+        self.n_unfinished -= 1
+
+    def flip(self):
+        """ Flips the window (and records the Python time spent on this frame). """
+        duration = time.perf_counter() - self._t_frame
+        self.n_flips += 1
+        self.frame_time += duration
+        self.max_frame_time = max(self.max_frame_time, duration)
+        self.win.flip()
+
+    def end(self):
+        """ Stops drawing all components and logs the Python time per frame (of this run). """
+        for comp in self._drawable:
+            comp.setAutoDraw(False)
+
+        if self.n_flips:
+            mean_ms = 1000 * self.frame_time / self.n_flips
+            max_ms = 1000 * self.max_frame_time
+            logging.exp(f"Routine {self.name}: {mean_ms:.3f} ms (mean), "
+                        f"{max_ms:.3f} ms (max) of Python time per frame")
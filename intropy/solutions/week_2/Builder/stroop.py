@@ -1,5 +1,16 @@
 ﻿#!/usr/bin/env python
 # -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# NOTE: THIS FILE IS MAINTAINED BY HAND -- DO NOT RECOMPILE IT FROM stroop.psyexp
+#
+# It was generated by PsychoPy Builder, but has since been edited by hand (the
+# Routine objects from routine.py, the trial records from trial_record.py, the
+# compiled conditions from ../conditions.py and the lazy imports and startup
+# marks from ../startup.py). Compiling stroop.psyexp (in Builder or with
+# `psychopy.scripts.psyexpCompile`) overwrites this file and loses these
+# changes, so make changes to the experiment in this file (and, where
+# possible, also in stroop.psyexp). See misc/for_developers.md.
+# ----------------------------------------------------------------------------
 """
 This experiment was created using PsychoPy3 Experiment Builder (v2020.2.9),
     on Wed Dec  2 14:27:38 2020
@@ -15,19 +26,26 @@ from __future__ import absolute_import, division
 
 from psychopy import locale_setup
 from psychopy import prefs
-from psychopy import sound, gui, visual, core, data, event, logging, clock
+from psychopy import gui, core, logging, clock
 from psychopy.constants import (NOT_STARTED, STARTED, PLAYING, PAUSED,
                                 STOPPED, FINISHED, PRESSED, RELEASED, FOREVER)
 
 import numpy as np  # whole numpy lib is available, prepend 'np.'
-from numpy import (sin, cos, tan, log, log10, pi, average,
-                   sqrt, std, deg2rad, rad2deg, linspace, asarray)
-from numpy.random import random, randint, normal, shuffle
 import os  # handy system and path functions
 import sys  # to get file system encoding
 
-from psychopy.hardware import keyboard
+# Shared modules of the week 2 experiments (startup.py, conditions.py) live one directory up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from startup import lazy_import, mark
+from conditions import load_conditions, to_dicts
+from trial_record import make_trial_record
+from routine import Routine
 
+# These are only imported when first used (after the dialog), so the dialog appears sooner
+visual = lazy_import('psychopy.visual')
+data = lazy_import('psychopy.data')
+event = lazy_import('psychopy.event')
+keyboard = lazy_import('psychopy.hardware.keyboard')
 
 
 # Ensure that relative paths start from the same directory as this script
@@ -38,7 +56,9 @@ os.chdir(_thisDir)
 psychopyVersion = '2020.2.9'
 expName = 'stroop'  # from the Builder filename that created this script
 expInfo = {'participant': ''}
+mark('dialog')  # see startup.py
 dlg = gui.DlgFromDict(dictionary=expInfo, sortKeys=False, title=expName)
+mark('dialog_closed')
 if dlg.OK == False:
     core.quit()  # user pressed cancel
 expInfo['date'] = data.getDateStr()  # add a simple timestamp
@@ -76,6 +96,7 @@ if expInfo['frameRate'] != None:
     frameDur = 1.0 / round(expInfo['frameRate'])
 else:
     frameDur = 1.0 / 60.0  # could not measure, so guess
+win.callOnFlip(mark, 'first_flip')  # first flip after measuring the frame rate
 
 # create a default keyboard (e.g. to check for escape)
 defaultKeyboard = keyboard.Keyboard()
@@ -170,6 +191,15 @@ ty_img = visual.ImageStim(
     flipHoriz=False, flipVert=False,
     texRes=512, interpolate=True, depth=0.0)
 
+# Keep track of the components of each routine (see routine.py)
+welcomeRoutine = Routine('welcome', win, welcomeClock, [welcome_txt])
+instructionsRoutine = Routine('instructions', win, instructionsClock, [instructions_txt, instructions_resp])
+init_fixRoutine = Routine('init_fix', win, init_fixClock, [polygon])
+stimRoutine = Routine('stim', win, stimClock, [trial_txt, trial_resp])
+isiRoutine = Routine('isi', win, isiClock, [fix_dot])
+feedbackRoutine = Routine('feedback', win, feedbackClock, [yes_circle, no_circle, mouse, feedback_txt])
+goodbyeRoutine = Routine('goodbye', win, goodbyeClock, [ty_img])
+
 # Create some handy timers
 globalClock = core.Clock()  # to track the time since experiment started
 routineTimer = core.CountdownTimer()  # to track time remaining of each (non-slip) routine 
@@ -178,28 +208,13 @@ routineTimer = core.CountdownTimer()  # to track time remaining of each (non-sli
 continueRoutine = True
 routineTimer.add(3.000000)
 # update component parameters for each repeat
-# keep track of which components have finished
-welcomeComponents = [welcome_txt]
-for thisComponent in welcomeComponents:
-    thisComponent.tStart = None
-    thisComponent.tStop = None
-    thisComponent.tStartRefresh = None
-    thisComponent.tStopRefresh = None
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-# reset timers
-t = 0
-_timeToFirstFrame = win.getFutureFlipTime(clock="now")
-welcomeClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-frameN = -1
+# keep track of which components have finished (see routine.py)
+welcomeRoutine.reset()
 
 # -------Run Routine "welcome"-------
 while continueRoutine and routineTimer.getTime() > 0:
-    # get current time
-    t = welcomeClock.getTime()
-    tThisFlip = win.getFutureFlipTime(clock=welcomeClock)
-    tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+    # get current time and (predicted) time of the next flip
+    t, tThisFlip, tThisFlipGlobal, frameN = welcomeRoutine.next_frame()
     # update/draw components on each frame
     
     # *welcome_txt* updates
@@ -217,7 +232,7 @@ while continueRoutine and routineTimer.getTime() > 0:
             welcome_txt.tStop = t  # not accounting for scr refresh
             welcome_txt.frameNStop = frameN  # exact frame index
             win.timeOnFlip(welcome_txt, 'tStopRefresh')  # time at next scr refresh
-            welcome_txt.setAutoDraw(False)
+            welcomeRoutine.finish(welcome_txt)
     
     # check for quit (typically the Esc key)
     if endExpNow or defaultKeyboard.getKeys(keyList=["escape"]):
@@ -226,20 +241,14 @@ while continueRoutine and routineTimer.getTime() > 0:
     # check if all components have finished
     if not continueRoutine:  # a component has requested a forced-end of Routine
         break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in welcomeComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
+    continueRoutine = welcomeRoutine.n_unfinished > 0  # at least one component has not yet finished
     
     # refresh the screen
     if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
+        welcomeRoutine.flip()
 
 # -------Ending Routine "welcome"-------
-for thisComponent in welcomeComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
+welcomeRoutine.end()
 thisExp.addData('welcome_txt.started', welcome_txt.tStartRefresh)
 thisExp.addData('welcome_txt.stopped', welcome_txt.tStopRefresh)
 
@@ -249,28 +258,13 @@ continueRoutine = True
 instructions_resp.keys = []
 instructions_resp.rt = []
 _instructions_resp_allKeys = []
-# keep track of which components have finished
-instructionsComponents = [instructions_txt, instructions_resp]
-for thisComponent in instructionsComponents:
-    thisComponent.tStart = None
-    thisComponent.tStop = None
-    thisComponent.tStartRefresh = None
-    thisComponent.tStopRefresh = None
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-# reset timers
-t = 0
-_timeToFirstFrame = win.getFutureFlipTime(clock="now")
-instructionsClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-frameN = -1
+# keep track of which components have finished (see routine.py)
+instructionsRoutine.reset()
 
 # -------Run Routine "instructions"-------
 while continueRoutine:
-    # get current time
-    t = instructionsClock.getTime()
-    tThisFlip = win.getFutureFlipTime(clock=instructionsClock)
-    tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+    # get current time and (predicted) time of the next flip
+    t, tThisFlip, tThisFlipGlobal, frameN = instructionsRoutine.next_frame()
     # update/draw components on each frame
     
     # *instructions_txt* updates
@@ -311,20 +305,14 @@ while continueRoutine:
     # check if all components have finished
     if not continueRoutine:  # a component has requested a forced-end of Routine
         break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in instructionsComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
+    continueRoutine = instructionsRoutine.n_unfinished > 0  # at least one component has not yet finished
     
     # refresh the screen
     if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
+        instructionsRoutine.flip()
 
 # -------Ending Routine "instructions"-------
-for thisComponent in instructionsComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
+instructionsRoutine.end()
 thisExp.addData('instructions_txt.started', instructions_txt.tStartRefresh)
 thisExp.addData('instructions_txt.stopped', instructions_txt.tStopRefresh)
 # check responses
@@ -343,28 +331,13 @@ routineTimer.reset()
 continueRoutine = True
 routineTimer.add(2.000000)
 # update component parameters for each repeat
-# keep track of which components have finished
-init_fixComponents = [polygon]
-for thisComponent in init_fixComponents:
-    thisComponent.tStart = None
-    thisComponent.tStop = None
-    thisComponent.tStartRefresh = None
-    thisComponent.tStopRefresh = None
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-# reset timers
-t = 0
-_timeToFirstFrame = win.getFutureFlipTime(clock="now")
-init_fixClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-frameN = -1
+# keep track of which components have finished (see routine.py)
+init_fixRoutine.reset()
 
 # -------Run Routine "init_fix"-------
 while continueRoutine and routineTimer.getTime() > 0:
-    # get current time
-    t = init_fixClock.getTime()
-    tThisFlip = win.getFutureFlipTime(clock=init_fixClock)
-    tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+    # get current time and (predicted) time of the next flip
+    t, tThisFlip, tThisFlipGlobal, frameN = init_fixRoutine.next_frame()
     # update/draw components on each frame
     
     # *polygon* updates
@@ -382,7 +355,7 @@ while continueRoutine and routineTimer.getTime() > 0:
             polygon.tStop = t  # not accounting for scr refresh
             polygon.frameNStop = frameN  # exact frame index
             win.timeOnFlip(polygon, 'tStopRefresh')  # time at next scr refresh
-            polygon.setAutoDraw(False)
+            init_fixRoutine.finish(polygon)
     
     # check for quit (typically the Esc key)
     if endExpNow or defaultKeyboard.getKeys(keyList=["escape"]):
@@ -391,74 +364,51 @@ while continueRoutine and routineTimer.getTime() > 0:
     # check if all components have finished
     if not continueRoutine:  # a component has requested a forced-end of Routine
         break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in init_fixComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
+    continueRoutine = init_fixRoutine.n_unfinished > 0  # at least one component has not yet finished
     
     # refresh the screen
     if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
+        init_fixRoutine.flip()
 
 # -------Ending Routine "init_fix"-------
-for thisComponent in init_fixComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
+init_fixRoutine.end()
 thisExp.addData('polygon.started', polygon.tStartRefresh)
 thisExp.addData('polygon.stopped', polygon.tStopRefresh)
 
 # set up handler to look after randomisation of conditions etc
+trial_conditions = to_dicts(load_conditions('conditions.xlsx'))
 trial_loop = data.TrialHandler(nReps=3, method='random', 
     extraInfo=expInfo, originPath=-1,
-    trialList=data.importConditions('conditions.xlsx'),
+    trialList=trial_conditions,
     seed=None, name='trial_loop')
 thisExp.addLoop(trial_loop)  # add the loop to the experiment
-thisTrial_loop = trial_loop.trialList[0]  # so we can initialise stimuli with some values
-# abbreviate parameter names if possible (e.g. rgb = thisTrial_loop.rgb)
-if thisTrial_loop != None:
-    for paramName in thisTrial_loop:
-        exec('{} = thisTrial_loop[paramName]'.format(paramName))
+# create a record class with the parameter names as attributes (e.g. trial.stim_word)
+# once, instead of exec'ing 'stim_word = thisTrial_loop[paramName]' on every trial
+Trial = make_trial_record(trial_conditions)
+trial = Trial(**trial_loop.trialList[0])  # so we can initialise stimuli with some values
 
 for thisTrial_loop in trial_loop:
     currentLoop = trial_loop
-    # abbreviate parameter names if possible (e.g. rgb = thisTrial_loop.rgb)
-    if thisTrial_loop != None:
-        for paramName in thisTrial_loop:
-            exec('{} = thisTrial_loop[paramName]'.format(paramName))
+    trial = Trial(**thisTrial_loop)
+    mark('trial')  # see startup.py
     
     # ------Prepare to start Routine "stim"-------
     continueRoutine = True
     routineTimer.add(5.000000)
     # update component parameters for each repeat
-    trial_txt.setColor(stim_color, colorSpace='rgb')
-    trial_txt.setText(stim_word)
+    trial_txt.setColor(trial.stim_color, colorSpace='rgb')
+    trial_txt.setText(trial.stim_word)
     trial_txt.setFont('Arial')
     trial_resp.keys = []
     trial_resp.rt = []
     _trial_resp_allKeys = []
-    # keep track of which components have finished
-    stimComponents = [trial_txt, trial_resp]
-    for thisComponent in stimComponents:
-        thisComponent.tStart = None
-        thisComponent.tStop = None
-        thisComponent.tStartRefresh = None
-        thisComponent.tStopRefresh = None
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    # reset timers
-    t = 0
-    _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    stimClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-    frameN = -1
+    # keep track of which components have finished (see routine.py)
+    stimRoutine.reset()
     
     # -------Run Routine "stim"-------
     while continueRoutine and routineTimer.getTime() > 0:
-        # get current time
-        t = stimClock.getTime()
-        tThisFlip = win.getFutureFlipTime(clock=stimClock)
-        tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+        # get current time and (predicted) time of the next flip
+        t, tThisFlip, tThisFlipGlobal, frameN = stimRoutine.next_frame()
         # update/draw components on each frame
         
         # *trial_txt* updates
@@ -476,7 +426,7 @@ for thisTrial_loop in trial_loop:
                 trial_txt.tStop = t  # not accounting for scr refresh
                 trial_txt.frameNStop = frameN  # exact frame index
                 win.timeOnFlip(trial_txt, 'tStopRefresh')  # time at next scr refresh
-                trial_txt.setAutoDraw(False)
+                stimRoutine.finish(trial_txt)
         
         # *trial_resp* updates
         waitOnFlip = False
@@ -498,7 +448,7 @@ for thisTrial_loop in trial_loop:
                 trial_resp.tStop = t  # not accounting for scr refresh
                 trial_resp.frameNStop = frameN  # exact frame index
                 win.timeOnFlip(trial_resp, 'tStopRefresh')  # time at next scr refresh
-                trial_resp.status = FINISHED
+                stimRoutine.finish(trial_resp)
         if trial_resp.status == STARTED and not waitOnFlip:
             theseKeys = trial_resp.getKeys(keyList=['left', 'right'], waitRelease=False)
             _trial_resp_allKeys.extend(theseKeys)
@@ -515,20 +465,14 @@ for thisTrial_loop in trial_loop:
         # check if all components have finished
         if not continueRoutine:  # a component has requested a forced-end of Routine
             break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in stimComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
+        continueRoutine = stimRoutine.n_unfinished > 0  # at least one component has not yet finished
         
         # refresh the screen
         if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
+            stimRoutine.flip()
     
     # -------Ending Routine "stim"-------
-    for thisComponent in stimComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
+    stimRoutine.end()
     trial_loop.addData('trial_txt.started', trial_txt.tStartRefresh)
     trial_loop.addData('trial_txt.stopped', trial_txt.tStopRefresh)
     # check responses
@@ -545,28 +489,13 @@ for thisTrial_loop in trial_loop:
     # update component parameters for each repeat
     import random
     t_isi = random.uniform(0, 1)
-    # keep track of which components have finished
-    isiComponents = [fix_dot]
-    for thisComponent in isiComponents:
-        thisComponent.tStart = None
-        thisComponent.tStop = None
-        thisComponent.tStartRefresh = None
-        thisComponent.tStopRefresh = None
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    # reset timers
-    t = 0
-    _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    isiClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-    frameN = -1
+    # keep track of which components have finished (see routine.py)
+    isiRoutine.reset()
     
     # -------Run Routine "isi"-------
     while continueRoutine:
-        # get current time
-        t = isiClock.getTime()
-        tThisFlip = win.getFutureFlipTime(clock=isiClock)
-        tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+        # get current time and (predicted) time of the next flip
+        t, tThisFlip, tThisFlipGlobal, frameN = isiRoutine.next_frame()
         # update/draw components on each frame
         
         # *fix_dot* updates
@@ -584,7 +513,7 @@ for thisTrial_loop in trial_loop:
                 fix_dot.tStop = t  # not accounting for scr refresh
                 fix_dot.frameNStop = frameN  # exact frame index
                 win.timeOnFlip(fix_dot, 'tStopRefresh')  # time at next scr refresh
-                fix_dot.setAutoDraw(False)
+                isiRoutine.finish(fix_dot)
         
         # check for quit (typically the Esc key)
         if endExpNow or defaultKeyboard.getKeys(keyList=["escape"]):
@@ -593,20 +522,14 @@ for thisTrial_loop in trial_loop:
         # check if all components have finished
         if not continueRoutine:  # a component has requested a forced-end of Routine
             break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in isiComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
+        continueRoutine = isiRoutine.n_unfinished > 0  # at least one component has not yet finished
         
         # refresh the screen
         if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
+            isiRoutine.flip()
     
     # -------Ending Routine "isi"-------
-    for thisComponent in isiComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
+    isiRoutine.end()
     trial_loop.addData('fix_dot.started', fix_dot.tStartRefresh)
     trial_loop.addData('fix_dot.stopped', fix_dot.tStopRefresh)
     # the Routine "isi" was not non-slip safe, so reset the non-slip timer
@@ -622,28 +545,13 @@ continueRoutine = True
 # setup some python lists for storing info about the mouse
 mouse.clicked_name = []
 gotValidClick = False  # until a click is received
-# keep track of which components have finished
-feedbackComponents = [yes_circle, no_circle, mouse, feedback_txt]
-for thisComponent in feedbackComponents:
-    thisComponent.tStart = None
-    thisComponent.tStop = None
-    thisComponent.tStartRefresh = None
-    thisComponent.tStopRefresh = None
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-# reset timers
-t = 0
-_timeToFirstFrame = win.getFutureFlipTime(clock="now")
-feedbackClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-frameN = -1
+# keep track of which components have finished (see routine.py)
+feedbackRoutine.reset()
 
 # -------Run Routine "feedback"-------
 while continueRoutine:
-    # get current time
-    t = feedbackClock.getTime()
-    tThisFlip = win.getFutureFlipTime(clock=feedbackClock)
-    tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+    # get current time and (predicted) time of the next flip
+    t, tThisFlip, tThisFlipGlobal, frameN = feedbackRoutine.next_frame()
     # update/draw components on each frame
     
     # *yes_circle* updates
@@ -703,20 +611,14 @@ while continueRoutine:
     # check if all components have finished
     if not continueRoutine:  # a component has requested a forced-end of Routine
         break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in feedbackComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
+    continueRoutine = feedbackRoutine.n_unfinished > 0  # at least one component has not yet finished
     
     # refresh the screen
     if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
+        feedbackRoutine.flip()
 
 # -------Ending Routine "feedback"-------
-for thisComponent in feedbackComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
+feedbackRoutine.end()
 thisExp.addData('yes_circle.started', yes_circle.tStartRefresh)
 thisExp.addData('yes_circle.stopped', yes_circle.tStopRefresh)
 thisExp.addData('no_circle.started', no_circle.tStartRefresh)
@@ -750,28 +652,13 @@ routineTimer.reset()
 continueRoutine = True
 routineTimer.add(3.000000)
 # update component parameters for each repeat
-# keep track of which components have finished
-goodbyeComponents = [ty_img]
-for thisComponent in goodbyeComponents:
-    thisComponent.tStart = None
-    thisComponent.tStop = None
-    thisComponent.tStartRefresh = None
-    thisComponent.tStopRefresh = None
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-# reset timers
-t = 0
-_timeToFirstFrame = win.getFutureFlipTime(clock="now")
-goodbyeClock.reset(-_timeToFirstFrame)  # t0 is time of first possible flip
-frameN = -1
+# keep track of which components have finished (see routine.py)
+goodbyeRoutine.reset()
 
 # -------Run Routine "goodbye"-------
 while continueRoutine and routineTimer.getTime() > 0:
-    # get current time
-    t = goodbyeClock.getTime()
-    tThisFlip = win.getFutureFlipTime(clock=goodbyeClock)
-    tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
+    # get current time and (predicted) time of the next flip
+    t, tThisFlip, tThisFlipGlobal, frameN = goodbyeRoutine.next_frame()
     # update/draw components on each frame
     
     # *ty_img* updates
@@ -789,7 +676,7 @@ while continueRoutine and routineTimer.getTime() > 0:
             ty_img.tStop = t  # not accounting for scr refresh
             ty_img.frameNStop = frameN  # exact frame index
             win.timeOnFlip(ty_img, 'tStopRefresh')  # time at next scr refresh
-            ty_img.setAutoDraw(False)
+            goodbyeRoutine.finish(ty_img)
     
     # check for quit (typically the Esc key)
     if endExpNow or defaultKeyboard.getKeys(keyList=["escape"]):
@@ -798,20 +685,14 @@ while continueRoutine and routineTimer.getTime() > 0:
     # check if all components have finished
     if not continueRoutine:  # a component has requested a forced-end of Routine
         break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in goodbyeComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
+    continueRoutine = goodbyeRoutine.n_unfinished > 0  # at least one component has not yet finished
     
     # refresh the screen
     if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
+        goodbyeRoutine.flip()
 
 # -------Ending Routine "goodbye"-------
-for thisComponent in goodbyeComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
+goodbyeRoutine.end()
 thisExp.addData('ty_img.started', ty_img.tStartRefresh)
 thisExp.addData('ty_img.stopped', ty_img.tStopRefresh)
 
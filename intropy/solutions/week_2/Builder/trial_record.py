@@ -0,0 +1,34 @@
+""" Attribute-style trial records for the trial loop of stroop.py.
+
+The Builder unpacks the parameters of each trial (the columns of the
+conditions file) into global variables by running
+`exec('{} = thisTrial_loop[paramName]'.format(paramName))` for every
+parameter, which compiles a string each time. Instead, we create a
+namedtuple class from the header of the conditions file once, and
+create a (cheap) record of that class for every trial, e.g.:
+
+    conditions = data.importConditions('conditions.xlsx')
+    Trial = make_trial_record(conditions)
+    for thisTrial_loop in trial_loop:
+        trial = Trial(**thisTrial_loop)
+        trial_txt.setText(trial.stim_word)
+"""
+from collections import namedtuple
+
+
+def make_trial_record(conditions, name='Trial'):
+    """ Creates a namedtuple class with the parameters of the conditions as fields.
+
+    Parameters
+    ----------
+    conditions : list of dict
+        Conditions, as returned by `psychopy.data.importConditions`
+    name : str
+        Name of the class
+
+    Returns
+    -------
+    Trial : type
+        A namedtuple class with a field for each parameter
+    """
+    return namedtuple(name, list(conditions[0].keys()))
@@ -1,13 +1,27 @@
-import pandas as pd
+import os
+import sys
+import time
 from psychopy.gui import DlgFromDict
-from psychopy.visual import Window, TextStim, ImageStim
+from psychopy.visual import Window, TextStim
 from psychopy.core import Clock, quit, wait
 from psychopy.event import Mouse
 from psychopy.hardware.keyboard import Keyboard
+from stimulus_pool import StimulusPool
+from trial_log import TrialLog, TrialWriter
+
+# Shared modules of the week 2 experiments (startup.py, conditions.py) live one directory up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from startup import lazy_import, mark
+from conditions import load_conditions
+
+# Pandas is only imported when first used (after the dialog), so the dialog appears sooner
+pd = lazy_import('pandas')
 
 ### DIALOG BOX ROUTINE ###
 exp_info = {'participant_nr': 99, 'age': ''}
+mark('dialog')  # see startup.py
 dlg = DlgFromDict(exp_info)
+mark('dialog_closed')
 
 # If pressed Cancel, abort!
 if not dlg.OK:
@@ -27,6 +41,7 @@ else:
 # Initialize a fullscreen window with my monitor (HD format) size
 # and my monitor specification called "samsung" from the monitor center
 win = Window(size=(1920, 1080), fullscr=False, monitor='samsung')
+win.callOnFlip(mark, 'first_flip')
 
 # Also initialize a mouse, although we're not going to use it
 mouse = Mouse(visible=False)
@@ -80,14 +95,37 @@ while True:
         break  # break out of the loop!
 
 ### TRIAL LOOP ROUTINE ###
-# Read in conditions file
-cond_df = pd.read_excel('emo_conditions.xlsx')
+# Read in conditions file (from its compiled version, which is much faster)
+cond_df = pd.DataFrame(load_conditions('emo_conditions.xlsx'))
 cond_df = cond_df.sample(frac=1)
 
 # Create fixation target (a plus sign)
 fix_target = TextStim(win, '+')
 trial_clock = Clock()
 
+# Create all stimuli before the trial loop, because creating
+# them at the start of a trial may cause dropped frames
+stim_pool = StimulusPool(win)
+for word in cond_df['word'].unique():
+    stim_pool.text(word, pos=(0, 0.3))
+
+for smiley in cond_df['smiley'].unique():
+    stim_pool.image(smiley + '.png', scale=0.5)  # make a bit smaller
+
+# Keep track of dropped frames
+win.recordFrameIntervals = True
+
+# Preallocate the log of the trial data (writing to cond_df
+# with .loc during the trial is slow)
+log_columns = {'onset': float, 'rt': float, 'resp': 'U10', 'correct': float, 'dropped_frames': int}
+log = TrialLog(len(cond_df), log_columns)
+
+# Also save every trial as soon as it is finished, so that no data is lost
+# when the experiment crashes or is aborted (in a new file per session)
+session = time.strftime('%Y%m%d-%H%M%S')
+writer = TrialWriter(f"sub-{exp_info['participant_nr']}_{session}_trials.csv",
+                     ['trial'] + list(cond_df.columns) + list(log_columns))
+
 # START exp clock
 clock.reset()
 
@@ -96,18 +134,20 @@ fix_target.draw()
 win.flip()
 wait(1)
 
-for idx, row in cond_df.iterrows():
+for trial, (idx, row) in enumerate(cond_df.iterrows()):
+    mark('trial')  # see startup.py
+
     # Extract current word and smiley
     curr_word = row['word']
     curr_smil = row['smiley']
 
-    # Create and draw text/img
-    stim_txt = TextStim(win, curr_word, pos=(0, 0.3))
-    stim_img = ImageStim(win, curr_smil + '.png', )
-    stim_img.size *= 0.5  # make a bit smaller
+    # Get the (preloaded) text/img
+    stim_txt = stim_pool.text(curr_word, pos=(0, 0.3))
+    stim_img = stim_pool.image(curr_smil + '.png', scale=0.5)
 
     # Initially, onset is undefined
-    cond_df.loc[idx, 'onset'] = -1
+    log['onset'][trial] = -1
+    n_dropped = win.nDroppedFrames
 
     trial_clock.reset()
     kb.clock.reset()
@@ -121,29 +161,40 @@ for idx, row in cond_df.iterrows():
             fix_target.draw()
             
         win.flip()
-        if cond_df.loc[idx, 'onset'] == -1:
-            cond_df.loc[idx, 'onset'] = clock.getTime()
+        if log['onset'][trial] == -1:
+            log['onset'][trial] = clock.getTime()
         
         # Get responses
         resp = kb.getKeys()
         if resp:
             # Stop the experiment when 'q' is pressed
             if 'q' in resp:
+                writer.close()
                 quit()
 
             # Log reaction time and response
-            cond_df.loc[idx, 'rt'] = resp[-1].rt
-            cond_df.loc[idx, 'resp'] = resp[-1].name
+            log.record(trial, rt=resp[-1].rt, resp=resp[-1].name)
 
             # Log correct/incorrect
             if resp[-1].name == 'left' and curr_smil == 'happy':
-               cond_df.loc[idx, 'correct'] = 1
+               log['correct'][trial] = 1
             elif resp[-1].name ==  'right' and curr_smil == 'angry':
-                cond_df.loc[idx, 'correct'] = 1
+                log['correct'][trial] = 1
             else:
-                cond_df.loc[idx, 'correct'] = 0
-        
-effect = cond_df.groupby('congruence').mean()
+                log['correct'][trial] = 0
+
+    # Log the number of frames dropped during this trial
+    log['dropped_frames'][trial] = win.nDroppedFrames - n_dropped
+
+    # Save the trial (in the background)
+    writer.write(trial=trial, **row.to_dict(), **{col: log[col][trial] for col in log_columns})
+
+writer.close()
+
+# Add the logged data to the conditions (only once, after the trial loop)
+cond_df = cond_df.join(log.to_df(index=cond_df.index))
+print(f"Dropped {win.nDroppedFrames} frames in total.")
+effect = cond_df.groupby('congruence').mean(numeric_only=True)
 rt_con = effect.loc['congruent', 'rt']
 rt_incon = effect.loc['incongruent', 'rt']
 acc = cond_df['correct'].mean()
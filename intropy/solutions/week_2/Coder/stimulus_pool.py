@@ -0,0 +1,63 @@
+""" A pool of preloaded stimuli for the trial loop of emo_stroop.py.
+
+Creating an `ImageStim` means reading and decoding the image file and
+uploading it to the graphics card as a texture, and creating a `TextStim`
+means rendering the text; both take long enough to cause dropped frames
+when done at the start of a trial. The `StimulusPool` below creates each
+unique stimulus only once (ideally before the trial loop) and afterwards
+returns the very same stimulus object whenever it is requested again.
+"""
+from psychopy.visual import TextStim, ImageStim
+
+
+class StimulusPool:
+    """ Creates and stores stimuli, such that each unique stimulus is created once.
+
+    Parameters
+    ----------
+    win : psychopy.visual.Window
+        Window to draw the stimuli in
+    """
+    def __init__(self, win):
+        """ Initializes an empty StimulusPool. """
+        self.win = win
+        self._stims = {}
+
+    def text(self, text, **kwargs):
+        """ Returns a TextStim with the given text (and other arguments).
+
+        Parameters
+        ----------
+        text : str
+            Text to show
+        kwargs : dict
+            Other arguments for TextStim (e.g., `pos`)
+        """
+        key = ('text', text, tuple(sorted(kwargs.items())))
+        if key not in self._stims:
+            self._stims[key] = TextStim(self.win, text, **kwargs)
+
+        return self._stims[key]
+
+    def image(self, image, scale=1, **kwargs):
+        """ Returns an ImageStim with the given image (and other arguments).
+
+        Parameters
+        ----------
+        image : str
+            Path to the image file
+        scale : int/float
+            Factor to scale the (original) size of the image with
+        kwargs : dict
+            Other arguments for ImageStim (e.g., `pos`)
+        """
+        key = ('image', image, scale, tuple(sorted(kwargs.items())))
+        if key not in self._stims:
+            stim = ImageStim(self.win, image, **kwargs)
+            stim.size *= scale
+            self._stims[key] = stim
+
+        return self._stims[key]
+
+    def __len__(self):
+        return len(self._stims)
@@ -0,0 +1,159 @@
+""" A preallocated log of trial data for emo_stroop.py.
+
+Writing to a pandas DataFrame with `.loc` inside the frame loop is slow
+(each write involves index lookups and, for new columns, allocation).
+The `TrialLog` below stores each column in a preallocated numpy array,
+which makes writing a value during a trial as cheap as indexing an array.
+The log is converted to a DataFrame only once, after the trial loop.
+
+Because the results are only saved at the end of the experiment, a crash
+(or pressing 'q') would lose all data. The `TrialWriter` therefore also
+appends each finished trial to a CSV file, from a background thread so that
+writing to disk never delays a frame. The file is also closed (after writing
+all queued trials) when Python exits, e.g., after an error. A partially
+written file can be read with `read_partial`.
+"""
+import io
+import csv
+import queue
+import atexit
+import threading
+import numpy as np
+
+
+class TrialLog:
+    """ Column-wise log of trial data, backed by preallocated numpy arrays.
+
+    Parameters
+    ----------
+    n_trials : int
+        Number of trials
+    columns : dict
+        Names (keys) and data types (values) of the columns, e.g.,
+        `{'rt': float, 'resp': 'U10'}`; float columns are initialized
+        with NaN, string columns with an empty string and other columns
+        with zeros
+    """
+    def __init__(self, n_trials, columns):
+        """ Initializes a TrialLog object. """
+        self.n_trials = n_trials
+        self._data = {}
+        for col, dtype in columns.items():
+            dtype = np.dtype(dtype)
+            if dtype.kind == 'f':
+                fill = np.nan
+            elif dtype.kind == 'U':
+                fill = ''
+            else:
+                fill = 0
+            self._data[col] = np.full(n_trials, fill, dtype=dtype)
+
+    def __getitem__(self, col):
+        """ Returns the array of a column (to read/write values with `log[col][trial]`). """
+        return self._data[col]
+
+    def record(self, trial, **values):
+        """ Logs one or more values of a single trial.
+
+        Parameters
+        ----------
+        trial : int
+            Index of the trial (starting at 0)
+        values : dict
+            Column names (keys) and values to log, e.g., `rt=0.53`
+        """
+        for col, value in values.items():
+            self._data[col][trial] = value
+
+    def to_df(self, index=None):
+        """ Converts the log to a pandas DataFrame.
+
+        Parameters
+        ----------
+        index : array-like
+            Index of the DataFrame (e.g., the index of the conditions DataFrame)
+        """
+        import pandas as pd  # imported here, so that importing this module stays fast
+        return pd.DataFrame(self._data, index=index)
+
+
+class TrialWriter:
+    """ Appends trials to a CSV file (one row per trial) from a background thread.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the CSV file, which may not exist yet (so that a rerun never
+        adds its trials to the file of an earlier session); use a timestamp
+        in the name to give each session its own file
+    columns : list
+        Names of the columns
+    """
+    def __init__(self, fname, columns):
+        """ Opens the file and starts the background thread. """
+        self.columns = list(columns)
+        self._f = open(fname, 'x', newline='', buffering=1)  # FileExistsError if it exists
+        self._writer = csv.writer(self._f)
+        self._writer.writerow(self.columns)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        """ Writes the queued rows to disk (runs in the background thread). """
+        while True:
+            row = self._queue.get()
+            if row is None:
+                break
+
+            self._writer.writerow(row)
+            self._f.flush()
+
+    def write(self, **values):
+        """ Queues a single trial for writing (without waiting for the disk).
+
+        Parameters
+        ----------
+        values : dict
+            Column names (keys) and values of the trial; missing columns are left empty
+        """
+        self._queue.put([values.get(col, '') for col in self.columns])
+
+    def close(self):
+        """ Writes all queued trials and closes the file (if it is not closed yet). """
+        if self._f.closed:
+            return
+
+        self._queue.put(None)
+        self._thread.join()
+        self._f.close()
+        atexit.unregister(self.close)
+
+
+def read_partial(fname):
+    """ Reads a (possibly partially written) file of a TrialWriter.
+
+    If the experiment crashed while a row was being written, the incomplete
+    last row is ignored.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the CSV file
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The trials that were completely written
+    """
+    import pandas as pd
+
+    with open(fname, newline='') as f_in:
+        text = f_in.read()
+
+    if not text.endswith('\n'):
+        text = text[:text.rfind('\n') + 1]
+
+    return pd.read_csv(io.StringIO(text))
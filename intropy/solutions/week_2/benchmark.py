@@ -0,0 +1,387 @@
+""" Headless timing benchmark for the week 2 experiments.
+
+Runs stroop.py or emo_stroop.py without a monitor and without a participant:
+the window, stimuli, mouse and dialog box are replaced by "null" versions that
+do not draw anything (so no GPU or display is needed), and the keyboard is
+replaced by one that replays a list of responses. Flips are still paced at the
+refresh rate of a (simulated) monitor, so the experiment runs with its real
+timing. Only the Python side of the experiment is measured (not the drawing):
+
+* per-frame Python time: the time from the end of one flip to the start of
+  the next one (not counting `wait`), i.e., the work done in the frame loop;
+* per-trial setup time: the time from the start of a trial (`mark('trial')`,
+  see startup.py) to its first flip;
+* total run time.
+
+Responses are read from a CSV file with the columns "key" and "rt" (e.g.,
+recorded from a real participant), or generated: 'return' (to get past the
+instructions) followed by random 'left'/'right' responses. The experiments
+run on a copy of this directory, so no data files end up in the repository:
+
+    python benchmark.py Builder/stroop.py Coder/emo_stroop.py
+    python benchmark.py --responses responses.csv --budget 2 Coder/emo_stroop.py
+
+With `--budget`, the benchmark fails (exits with 1) when the 95th percentile
+of the per-frame Python time exceeds the budget (in ms), which catches
+regressions in CI. Needs PsychoPy's non-graphical modules (core, data, logging).
+"""
+import os
+import sys
+import csv
+import json
+import time
+import types
+import random
+import runpy
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Filled in by the null window, the patched `wait` and `mark('trial')` during a run
+_RECORD = {'flip_start': [], 'flip_end': [], 'waited': [], 'trials': [], 'dropped': 0}
+
+
+def generate_responses(n=500, seed=0):
+    """ Generates a 'return' followed by n random 'left'/'right' responses (and RTs). """
+    rng = random.Random(seed)
+    return [('return', 0.5)] + [(rng.choice(['left', 'right']), rng.uniform(0.3, 0.8))
+                                for _ in range(n)]
+
+
+def load_responses(fname):
+    """ Loads responses from a CSV file with the columns "key" and "rt". """
+    with open(fname, newline='') as f_in:
+        return [(row['key'], float(row['rt'])) for row in csv.DictReader(f_in)]
+
+
+def _make_null_modules(responses, info, refresh_rate):
+    """ Creates the null versions of psychopy.visual, psychopy.event,
+    psychopy.gui and psychopy.hardware.keyboard. """
+    from psychopy import core, logging
+    from psychopy.constants import NOT_STARTED, STARTED, FINISHED
+
+    frame_period = 1 / refresh_rate
+    base = logging.defaultClock  # all times of the window are on this clock
+    responses = list(responses)
+
+    class NullWindow:
+        """ A window that does not draw, but flips at the refresh rate of a monitor. """
+        def __init__(self, size=(800, 600), units='norm', **kwargs):
+            self.size = np.array(size)
+            self.units = units
+            self.monitorFramePeriod = frame_period
+            self.lastFrameT = base.getTime()
+            self.recordFrameIntervals = False
+            self.nDroppedFrames = 0
+            self.mouseVisible = True
+            self._toCall = []
+
+        def callOnFlip(self, function, *args, **kwargs):
+            self._toCall.append((function, args, kwargs))
+
+        def timeOnFlip(self, obj, attrib):
+            self.callOnFlip(self._assignFlipTime, obj, attrib)
+
+        def _assignFlipTime(self, obj, attrib):
+            setattr(obj, attrib, self._frameTime)
+
+        def getFutureFlipTime(self, targetTime=0, clock=None):
+            now = base.getTime()
+            next_flip = max(self.lastFrameT + self.monitorFramePeriod, now) + targetTime
+            if clock is None:
+                return next_flip
+            elif clock == 'now':
+                return next_flip - now
+            else:
+                return next_flip + base.getLastResetTime() - clock.getLastResetTime()
+
+        def getActualFrameRate(self, *args, **kwargs):
+            return refresh_rate
+
+        def flip(self, clearBuffer=True):
+            _RECORD['flip_start'].append(time.perf_counter())
+            now = base.getTime()
+            next_flip = self.lastFrameT + self.monitorFramePeriod
+            if now > next_flip:  # missed the refresh, so wait for the one after
+                missed = int((now - self.lastFrameT) // self.monitorFramePeriod)
+                next_flip = self.lastFrameT + (missed + 1) * self.monitorFramePeriod
+                if self.recordFrameIntervals and missed > 1:
+                    self.nDroppedFrames += missed - 1
+                    _RECORD['dropped'] += missed - 1
+
+            time.sleep(max(0, next_flip - base.getTime()))
+            self.lastFrameT = self._frameTime = base.getTime()
+            _RECORD['flip_end'].append(time.perf_counter())
+            _RECORD['waited'].append(0.0)
+            for function, args, kwargs in self._toCall:
+                function(*args, **kwargs)
+
+            self._toCall = []
+            return self._frameTime
+
+        def setMouseVisible(self, visibility):
+            self.mouseVisible = visibility
+
+        def close(self):
+            pass
+
+    class NullStim:
+        """ A stimulus that keeps track of its (auto)draw status, but does not draw. """
+        def __init__(self, win=None, text='', image=None, name=None, size=(1, 1), **kwargs):
+            self.win = win
+            self.text = text
+            self.image = image
+            self.name = name
+            self.size = np.array(size if size is not None else (1, 1), dtype=float)
+            self.status = NOT_STARTED
+            self.autoDraw = False
+            self.__dict__.update(kwargs)
+
+        def __getattr__(self, attr):
+            if attr.startswith('set') and len(attr) > 3:  # e.g., setText or setColor
+                name = attr[3].lower() + attr[4:]
+                return lambda value, *args, **kwargs: setattr(self, name, value)
+            raise AttributeError(attr)
+
+        def setAutoDraw(self, value, log=None):
+            self.autoDraw = value
+            self.status = STARTED if value else FINISHED
+
+        def draw(self, win=None):
+            pass
+
+        def contains(self, x, y=None, units=None):
+            return True
+
+    class NullMouse:
+        """ A mouse that is pressed at every other call to `getPressed` (always on a stimulus). """
+        def __init__(self, win=None, visible=True, newPos=None):
+            self.win = win
+            self.visible = visible
+            self.status = None
+            self._n_calls = 0
+
+        def getPressed(self, getTime=False):
+            self._n_calls += 1
+            return [self._n_calls % 2 == 0, 0, 0]
+
+        def getPos(self):
+            return np.zeros(2)
+
+        def setVisible(self, visible):
+            self.visible = visible
+
+        def clickReset(self, buttons=(0, 1, 2)):
+            pass
+
+    class KeyPress(str):
+        """ A key press, which (like PsychoPy's) compares equal to the name of the key. """
+        def __new__(cls, name, rt):
+            key = super().__new__(cls, name)
+            key.name, key.rt, key.duration = name, rt, 0.1
+            return key
+
+    class ScriptedKeyboard:
+        """ A keyboard that replays responses; the next response is returned when
+        it is in `keyList` and its RT (on the keyboard's clock) has passed. """
+        def __init__(self, *args, **kwargs):
+            self.clock = core.Clock()
+            self.status = NOT_STARTED
+
+        def getKeys(self, keyList=None, waitRelease=True, clear=True):
+            if not responses:
+                return []
+
+            key, rt = responses[0]
+            if keyList is not None and key not in keyList:
+                return []
+
+            if self.clock.getTime() < rt:
+                return []
+
+            responses.pop(0)
+            return [KeyPress(key, rt)]
+
+        def clearEvents(self, eventType=None):
+            pass
+
+    class NullDlg:
+        """ A dialog box that is "filled in" with the given information. """
+        def __init__(self, dictionary, *args, **kwargs):
+            for key, value in dictionary.items():
+                if value == '' and key in info:
+                    dictionary[key] = info[key]
+            self.dictionary = dictionary
+            self.data = list(dictionary.values())
+            self.OK = True
+
+    visual = types.ModuleType('psychopy.visual')
+    visual.Window = NullWindow
+    visual.TextStim = visual.ImageStim = visual.Polygon = visual.Rect = visual.Circle = NullStim
+    event = types.ModuleType('psychopy.event')
+    event.Mouse = NullMouse
+    event.getKeys = lambda *args, **kwargs: []
+    event.clearEvents = lambda *args, **kwargs: None
+    gui = types.ModuleType('psychopy.gui')
+    gui.DlgFromDict = NullDlg
+    keyboard = types.ModuleType('psychopy.hardware.keyboard')
+    keyboard.Keyboard = ScriptedKeyboard
+    keyboard.KeyPress = KeyPress
+    return {'psychopy.visual': visual, 'psychopy.event': event, 'psychopy.gui': gui,
+            'psychopy.hardware.keyboard': keyboard}
+
+
+def _install(modules):
+    """ Replaces PsychoPy's graphical modules (and `wait`/`quit`) by their null versions. """
+    import psychopy
+    import psychopy.hardware
+    from psychopy import core
+
+    for name, module in modules.items():
+        sys.modules[name] = module
+        parent, _, child = name.rpartition('.')
+        setattr(sys.modules[parent], child, module)
+
+    def wait(secs, hogCPUperiod=0.2):
+        time.sleep(secs)
+        if _RECORD['waited']:  # not part of the Python time of the frame
+            _RECORD['waited'][-1] += secs
+
+    def quit():
+        raise SystemExit(0)
+
+    core.wait = wait
+    core.quit = quit
+
+
+def summarize(total_time):
+    """ Summarizes the recorded flips and trials.
+
+    Returns
+    -------
+    summary : dict
+        Per-frame Python time and per-trial setup time (in ms; mean, median,
+        95th percentile and max), the number of frames, trials and dropped
+        frames, and the total run time (in seconds)
+    """
+    start = np.array(_RECORD['flip_start'])
+    end = np.array(_RECORD['flip_end'])
+    waited = np.array(_RECORD['waited'])
+    frame_ms = 1000 * (start[1:] - end[:-1] - waited[:-1])
+
+    trials = np.array(_RECORD['trials'])
+    idx = np.searchsorted(start, trials)  # first flip after the start of each trial
+    valid = idx < len(start)
+    setup_ms = 1000 * (start[idx[valid]] - trials[valid])
+    # Frames during which a trial was set up are counted as setup time (not as frame time)
+    is_frame = np.ones(len(frame_ms), dtype=bool)
+    is_frame[idx[valid & (idx > 0)] - 1] = False
+    frame_ms = frame_ms[is_frame]
+
+    def stats(x):
+        if not len(x):
+            return None
+        return {'mean': float(np.mean(x)), 'median': float(np.median(x)),
+                'p95': float(np.percentile(x, 95)), 'max': float(np.max(x))}
+
+    return {'frame_ms': stats(frame_ms), 'trial_setup_ms': stats(setup_ms),
+            'n_frames': len(start), 'n_trials': len(trials),
+            'dropped_frames': _RECORD['dropped'], 'total_s': total_time}
+
+
+def run(script, responses, info, refresh_rate=60):
+    """ Runs an experiment with null graphics and a scripted keyboard (in this process).
+
+    Parameters
+    ----------
+    script : str
+        Path to the experiment (relative to this directory)
+    responses : list
+        Tuples with the key and RT of each response
+    info : dict
+        Values for the empty fields of the dialog box
+    refresh_rate : int
+        Refresh rate (in Hz) of the simulated monitor
+
+    Returns
+    -------
+    summary : dict
+        See `summarize`
+    """
+    _install(_make_null_modules(responses, info, refresh_rate))
+    from startup import add_hook
+
+    add_hook(lambda name: _RECORD['trials'].append(time.perf_counter()) if name == 'trial' else None)
+    path = os.path.abspath(script)
+    sys.path.insert(0, os.path.dirname(path))
+    os.chdir(os.path.dirname(path))
+    t_start = time.perf_counter()
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except SystemExit:
+        pass
+
+    return summarize(time.perf_counter() - t_start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the week 2 experiments headless and times them.')
+    parser.add_argument('scripts', nargs='+', help='Experiments to benchmark (relative to this directory)')
+    parser.add_argument('--responses', default=None, help='CSV file with the columns "key" and "rt"')
+    parser.add_argument('--refresh-rate', type=int, default=60, help='Refresh rate of the simulated monitor')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='Fail when the 95th percentile of the per-frame Python time exceeds this (ms)')
+    parser.add_argument('--json', default=None, help='Where to write the results')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    responses = load_responses(args.responses) if args.responses else generate_responses()
+    info = {'participant': 'bench', 'participant_nr': 99, 'age': '30'}
+    if args.child:  # runs a single experiment (in a copy of this directory)
+        summary = run(args.scripts[0], responses, info, args.refresh_rate)
+        with open(args.json, 'w') as f_out:
+            json.dump(summary, f_out)
+        return 0
+
+    results, failed = {}, False
+    with tempfile.TemporaryDirectory() as tmp:
+        # Each experiment runs in a separate process (in a copy of this directory)
+        work_dir = os.path.join(tmp, 'week_2')
+        shutil.copytree(BENCH_DIR, work_dir, ignore=shutil.ignore_patterns('__pycache__', 'data'))
+        for script in args.scripts:
+            out = os.path.join(tmp, 'summary.json')
+            cmd = [sys.executable, os.path.join(work_dir, 'benchmark.py'), '--child', script,
+                   '--refresh-rate', str(args.refresh_rate), '--json', out]
+            if args.responses:
+                cmd += ['--responses', os.path.abspath(args.responses)]
+
+            subprocess.run(cmd, cwd=work_dir, check=True)
+            with open(out) as f_in:
+                results[script] = summary = json.load(f_in)
+
+            print(f"\n{script} ({summary['total_s']:.1f} s, {summary['n_frames']} frames, "
+                  f"{summary['n_trials']} trials, {summary['dropped_frames']} dropped frames)")
+            for key, label in [('frame_ms', 'per-frame Python time'), ('trial_setup_ms', 'per-trial setup time')]:
+                if summary[key] is not None:
+                    s = summary[key]
+                    print(f"  {label:22s}: {s['mean']:.3f} ms (mean), {s['median']:.3f} ms (median), "
+                          f"{s['p95']:.3f} ms (95%), {s['max']:.3f} ms (max)")
+
+            if args.budget is not None and summary['frame_ms']['p95'] > args.budget:
+                print(f"  FAILED: per-frame Python time (95%) exceeds the budget of {args.budget} ms")
+                failed = True
+
+    if args.json:
+        with open(args.json, 'w') as f_out:
+            json.dump(results, f_out, indent=1)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
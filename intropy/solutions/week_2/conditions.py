@@ -0,0 +1,102 @@
+""" A compiled cache of condition files for the week 2 experiments.
+
+Reading a conditions file in Excel format (`data.importConditions` in
+stroop.py and `pd.read_excel` in emo_stroop.py) means importing pandas and
+openpyxl and parsing a zipped XML file, which takes hundreds of milliseconds
+at the start of every run. `load_conditions` below instead loads a
+"compiled" version of the file: a numpy record array (one field per column)
+stored as an .npy file next to the original file (e.g., conditions.xlsx.npy),
+which loads in about a millisecond and only needs numpy. The compiled file is
+(re)built automatically when it does not exist or when the original file is newer.
+
+Condition files can also be compiled in advance, e.g.:
+
+    python conditions.py Builder/conditions.xlsx ../../config/cd_conditions.csv
+"""
+import os
+import sys
+import numpy as np
+
+
+def compiled_path(fname):
+    """ Returns the path to the compiled version of a condition file. """
+    return fname + '.npy'
+
+
+def compile_conditions(fname):
+    """ Reads a condition file (.xlsx or .csv) and stores it as an .npy file.
+
+    Columns with text are stored as (unicode) strings, with empty cells as
+    empty strings; all other columns keep their (numeric) data type.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the condition file
+
+    Returns
+    -------
+    conditions : numpy.ndarray
+        Record array with one field per column and one element per row
+    """
+    import pandas as pd  # only needed when (re)building
+
+    if fname.endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(fname)
+    elif fname.endswith('.csv'):
+        df = pd.read_csv(fname, encoding='utf-8-sig')  # some files start with a BOM
+    else:
+        raise ValueError(f"Cannot compile {fname}; use an .xlsx or .csv file!")
+
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if values.dtype.kind in 'biuf':
+            columns.append(values.to_numpy())
+        else:
+            columns.append(values.fillna('').astype(str).to_numpy(dtype=str))
+
+    conditions = np.rec.fromarrays(columns, names=[str(col) for col in df.columns])
+    # Write to a temporary file first, so an interrupted run never leaves a broken cache
+    tmp = compiled_path(fname) + '.tmp'
+    with open(tmp, 'wb') as f_out:
+        np.save(f_out, conditions, allow_pickle=False)
+    os.replace(tmp, compiled_path(fname))
+    return conditions
+
+
+def load_conditions(fname):
+    """ Loads a condition file from its compiled version (compiling it if necessary).
+
+    Parameters
+    ----------
+    fname : str
+        Path to the condition file (.xlsx or .csv)
+
+    Returns
+    -------
+    conditions : numpy.ndarray
+        Record array with one field per column and one element per row;
+        use `pd.DataFrame(conditions)` for a DataFrame or `to_dicts`
+        for a list of dictionaries (like `data.importConditions`)
+    """
+    npy = compiled_path(fname)
+    if not os.path.isfile(npy) or os.path.getmtime(fname) > os.path.getmtime(npy):
+        return compile_conditions(fname)
+
+    return np.load(npy, allow_pickle=False).view(np.recarray)
+
+
+def to_dicts(conditions):
+    """ Converts compiled conditions to a list with a dictionary per row. """
+    names = conditions.dtype.names
+    return [dict(zip(names, row)) for row in conditions.tolist()]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python conditions.py FILE [FILE ...]")
+
+    for fname in sys.argv[1:]:
+        conditions = compile_conditions(fname)
+        print(f"Compiled {fname} ({len(conditions)} rows) to {compiled_path(fname)}")
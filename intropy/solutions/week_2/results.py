@@ -0,0 +1,256 @@
+""" Summary statistics of the results of the week 2 experiments.
+
+Both Stroop experiments write one file per participant: `sub-{nr}_results.csv`
+(emo_stroop.py) or `data/sub-{participant}.csv` (stroop.py). Instead of
+loading and summarizing these files one by one (with a `groupby` per file),
+`summarize` takes the trials of all participants in a single DataFrame and
+computes the statistics of every participant and condition at once: the
+trials are assigned an integer group (participant x condition) and all sums
+and counts are computed with `np.bincount`, which scales to thousands of
+participants. Reaction times (RTs) of correct trials are trimmed in two
+steps: first RTs outside fixed bounds (e.g., anticipations), then RTs more
+than a number of standard deviations away from the mean of their group.
+
+The files themselves are read in parallel by `read_results`, which can read
+only the columns that are needed and stores text columns as categoricals.
+
+Example
+-------
+>>> from results import read_results, summarize
+>>> df = read_results('Coder/sub-*_results.csv', usecols=['congruence', 'rt', 'correct'])
+>>> summary = summarize(df)
+>>> summary.effect  # congruency effect per participant
+"""
+import os
+import re
+import sys
+import glob
+import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+RTSummary = namedtuple('RTSummary', ['subjects', 'conditions', 'effect'])
+RTSummary.__doc__ = """ Result of summarizing the trials of many participants.
+
+Parameters
+----------
+subjects : pandas.DataFrame
+    Statistics per participant and condition (n_trials, accuracy, and the
+    number, mean and standard deviation of the RTs after trimming)
+conditions : pandas.DataFrame
+    Mean (and standard deviation across participants) of the accuracy and
+    mean RT per condition
+effect : pandas.DataFrame or None
+    Congruency effect (incongruent minus congruent) in RT and accuracy per
+    participant, or None if the conditions are not congruent/incongruent
+"""
+
+# E.g., "sub-01_results.csv" or "sub-bench.csv"
+PARTICIPANT_PATTERN = re.compile(r'sub-([^_.]+)')
+
+
+def participant_id(fname):
+    """ Extracts the participant from a file name (e.g., '01' from 'sub-01_results.csv'). """
+    match = PARTICIPANT_PATTERN.search(os.path.basename(fname))
+    return match.group(1) if match else os.path.splitext(os.path.basename(fname))[0]
+
+
+def _read_one(fname, usecols=None):
+    """ Reads the result file of a single participant (and adds the participant). """
+    df = pd.read_csv(fname, usecols=usecols)
+    df['participant'] = participant_id(fname)
+    return df
+
+
+def read_results(pattern, usecols=None, workers=None, processes=False, categorical=True):
+    """ Reads the result files of all participants into a single DataFrame.
+
+    The files are parsed in parallel, by a pool of threads (the default;
+    pandas' CSV parser releases the GIL for most of its work) or processes.
+
+    Parameters
+    ----------
+    pattern : str or list
+        Glob pattern(s) of the files (e.g., 'Coder/sub-*_results.csv' or 'Builder/data/*.csv')
+    usecols : list
+        Only read these columns (which is faster and uses less memory)
+    workers : int
+        Number of threads/processes (default: number of CPUs)
+    processes : bool
+        Whether to use processes instead of threads
+    categorical : bool
+        Whether to store text columns (and the participant) as categoricals,
+        which uses far less memory for many participants
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        All trials, with an additional column "participant"
+    """
+    patterns = [pattern] if isinstance(pattern, str) else pattern
+    files = sorted(set(f for p in patterns for f in glob.glob(p)))
+    if not files:
+        raise FileNotFoundError(f"No files match {pattern}!")
+
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool(max_workers=workers) as executor:
+        dfs = list(executor.map(_read_one, files, [usecols] * len(files)))
+
+    df = pd.concat(dfs, ignore_index=True)
+    if categorical:
+        ids = list(dict.fromkeys(participant_id(f) for f in files))
+        df['participant'] = pd.Categorical(df['participant'], categories=ids)
+        for col in df.columns.drop('participant'):
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].astype('category')
+
+    return df
+
+
+def from_builder(df):
+    """ Converts the data of stroop.py (Builder) to the columns of emo_stroop.py.
+
+    Only the rows of trials are kept; the congruence is derived from the word
+    and its color and a response is correct when it matches the color (green =
+    left, red = right). Trials without a response are incorrect.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Data of one or more participants (with the columns "stim_word",
+        "stim_color", "trial_resp.keys", "trial_resp.rt" and "participant")
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Trials with the columns "participant", "congruence", "resp", "rt" and "correct"
+    """
+    df = df.loc[df['stim_word'].notna()]
+    resp = df['trial_resp.keys']
+    correct = ((df['stim_color'] == 'green') & (resp == 'left')) | \
+              ((df['stim_color'] == 'red') & (resp == 'right'))
+    return pd.DataFrame({
+        'participant': df['participant'].astype(str),
+        'congruence': np.where(df['stim_word'] == df['stim_color'], 'congruent', 'incongruent'),
+        'resp': resp,
+        'rt': df['trial_resp.rt'],
+        'correct': correct.astype(float)
+    })
+
+
+def _group_stats(groups, values, mask, n_groups):
+    """ Computes the count, mean and standard deviation of `values[mask]` per group. """
+    g, x = groups[mask], values[mask]
+    n = np.bincount(g, minlength=n_groups)
+    s1 = np.bincount(g, weights=x, minlength=n_groups)
+    s2 = np.bincount(g, weights=x ** 2, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = s1 / n
+        sd = np.sqrt(np.maximum(s2 - n * mean ** 2, 0) / (n - 1))
+
+    sd[n < 2] = np.nan
+    return n, mean, sd
+
+
+def summarize(df, condition='congruence', rt='rt', correct='correct', participant='participant',
+              min_rt=0.1, max_rt=None, trim_sd=2.5, correct_only=True):
+    """ Computes RT and accuracy statistics per participant and condition.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Trials of all participants (e.g., from `read_results`)
+    condition : str
+        Column with the condition of each trial
+    rt : str
+        Column with the RT (in seconds; missing if there was no response)
+    correct : str
+        Column with whether the response was correct (1) or not (0);
+        missing values (no response) count as incorrect
+    participant : str
+        Column with the participant of each trial
+    min_rt, max_rt : float
+        RTs outside these bounds (in seconds) are excluded (use None for no bound)
+    trim_sd : float
+        RTs more than this number of standard deviations from the mean of
+        their participant and condition are excluded (use None for no trimming)
+    correct_only : bool
+        Whether to only use the RTs of correct trials
+
+    Returns
+    -------
+    summary : RTSummary
+        Statistics per participant and condition, per condition and the congruency effect
+    """
+    p_codes, participants = pd.factorize(df[participant], sort=True)
+    c_codes, conditions = pd.factorize(df[condition], sort=True)
+    n_cond = len(conditions)
+    n_groups = len(participants) * n_cond
+    groups = p_codes * n_cond + c_codes
+
+    rts = df[rt].to_numpy(dtype=float)
+    corr = np.nan_to_num(df[correct].to_numpy(dtype=float))
+    n_trials = np.bincount(groups, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        accuracy = np.bincount(groups, weights=corr, minlength=n_groups) / n_trials
+
+    valid = ~np.isnan(rts)
+    if min_rt is not None:
+        valid &= rts >= min_rt
+    if max_rt is not None:
+        valid &= rts <= max_rt
+    if correct_only:
+        valid &= corr == 1
+
+    n_rt, rt_mean, rt_sd = _group_stats(groups, rts, valid, n_groups)
+    if trim_sd is not None:
+        # Groups with a single RT (and thus no SD) are not trimmed
+        dist = np.abs(rts - rt_mean[groups])
+        valid &= ~(dist > trim_sd * rt_sd[groups])
+        n_rt, rt_mean, rt_sd = _group_stats(groups, rts, valid, n_groups)
+
+    index = pd.MultiIndex.from_product([participants, conditions], names=[participant, condition])
+    subjects = pd.DataFrame({'n_trials': n_trials, 'accuracy': accuracy, 'n_rt': n_rt,
+                             'rt_mean': rt_mean, 'rt_sd': rt_sd}, index=index)
+    subjects = subjects.loc[subjects['n_trials'] > 0]
+
+    # Participants x conditions arrays (NaN if a participant has no trials of a condition)
+    wide_rt = rt_mean.reshape(len(participants), n_cond)
+    wide_acc = np.where(n_trials > 0, accuracy, np.nan).reshape(len(participants), n_cond)
+    with warnings.catch_warnings():  # conditions without any (valid) RTs are NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        cond_stats = pd.DataFrame({
+            'n_participants': np.sum(~np.isnan(wide_acc), axis=0),
+            'accuracy': np.nanmean(wide_acc, axis=0),
+            'accuracy_sd': np.nanstd(wide_acc, axis=0, ddof=1),
+            'rt_mean': np.nanmean(wide_rt, axis=0),
+            'rt_sd': np.nanstd(wide_rt, axis=0, ddof=1)
+        }, index=pd.Index(conditions, name=condition))
+
+    effect = None
+    if 'congruent' in conditions and 'incongruent' in conditions:
+        con, incon = conditions.get_loc('congruent'), conditions.get_loc('incongruent')
+        effect = pd.DataFrame({
+            'rt': wide_rt[:, incon] - wide_rt[:, con],
+            'accuracy': wide_acc[:, incon] - wide_acc[:, con]
+        }, index=pd.Index(participants, name=participant))
+
+    return RTSummary(subjects, cond_stats, effect)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python results.py PATTERN [--builder]")
+
+    df = read_results(sys.argv[1])
+    if '--builder' in sys.argv:
+        df = from_builder(df)
+
+    summary = summarize(df)
+    print(summary.conditions)
+    if summary.effect is not None:
+        print(f"\nCongruency effect (RT): {summary.effect['rt'].mean():.3f} s "
+              f"(across {summary.effect['rt'].notna().sum()} participants)")
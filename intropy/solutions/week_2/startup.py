@@ -0,0 +1,192 @@
+""" Lazy imports and a startup profiler for the week 2 experiments.
+
+Importing PsychoPy's modules (and pandas) takes seconds, which participants
+spend looking at an empty screen before the dialog box appears. With
+`lazy_import`, a module is only really imported when one of its attributes
+is used for the first time, e.g.:
+
+    visual = lazy_import('psychopy.visual')  # returns immediately
+    win = visual.Window()                    # psychopy.visual is imported here
+
+The experiments call `mark` at the moments that matter (before and after the
+dialog box and after the first flip of the window). Running this file on one
+or more experiments reports the time until the dialog box appears, the time
+until the first flip (not counting the time spent in the dialog box) and the
+slowest imports (from `python -X importtime`), e.g.:
+
+    python startup.py Builder/stroop.py Coder/emo_stroop.py
+    python startup.py --exit-at dialog Builder/stroop.py  # no need to fill in the dialog
+
+To compare with the situation before a change, run it on an older version of
+the experiment (e.g., after `git stash`).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import importlib.util
+
+
+# When set, `mark` appends its timestamps to this file (and may exit the experiment)
+PROFILE_ENV = 'INTROPY_STARTUP_PROFILE'
+EXIT_ENV = 'INTROPY_STARTUP_EXIT'
+
+# Functions called (with the name of the mark) by `mark`, e.g., by benchmark.py
+_HOOKS = []
+
+
+def lazy_import(name):
+    """ Returns a module that is only imported when one of its attributes is used.
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module (e.g., 'psychopy.visual')
+
+    Returns
+    -------
+    module : module
+        The (not yet executed) module
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)  # note: this imports the parent package
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+
+    return module
+
+
+def mark(name):
+    """ Records the (wall clock) time at which the experiment reached a certain point.
+
+    Does nothing unless the experiment is run by this file's profiler
+    (or a hook was added with `add_hook`).
+
+    Parameters
+    ----------
+    name : str
+        Name of the moment (e.g., 'dialog', 'first_flip' or 'trial')
+    """
+    for hook in _HOOKS:
+        hook(name)
+
+    path = os.environ.get(PROFILE_ENV)
+    if path is None:
+        return
+
+    with open(path, 'a') as f_out:
+        f_out.write(json.dumps({'mark': name, 'time': time.time()}) + '\n')
+
+    if os.environ.get(EXIT_ENV) == name:
+        os._exit(0)  # skip the rest of the experiment (and its cleanup)
+
+
+def add_hook(func):
+    """ Adds a function that is called (with the name of the mark) on every `mark`. """
+    _HOOKS.append(func)
+
+
+def parse_importtime(stderr):
+    """ Parses the output of `python -X importtime`.
+
+    Returns
+    -------
+    imports : list
+        Tuples with the cumulative time (in seconds) and name of each
+        top-level import (i.e., not imported by another module)
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # nested imports are indented
+            imports.append((int(cumulative) / 1e6, name.strip()))
+
+    return imports
+
+
+def profile(script, exit_at=None):
+    """ Runs an experiment and measures its startup time.
+
+    Parameters
+    ----------
+    script : str
+        Path to the experiment (run from its own directory)
+    exit_at : str
+        Name of the mark at which to exit the experiment (or None to run it completely)
+
+    Returns
+    -------
+    times : dict
+        Seconds from the start of the process to each mark; 'first_flip'
+        does not include the time spent in the dialog box
+    imports : list
+        Cumulative time and name of the top-level imports (see `parse_importtime`)
+    """
+    script = os.path.abspath(script)
+    marks_file = script + '.startup.jsonl'
+    if os.path.isfile(marks_file):
+        os.remove(marks_file)
+
+    env = dict(os.environ, **{PROFILE_ENV: marks_file})
+    if exit_at is not None:
+        env[EXIT_ENV] = exit_at
+
+    t_start = time.time()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', script], env=env,
+                          cwd=os.path.dirname(script), stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+
+    marks = {}
+    if os.path.isfile(marks_file):
+        with open(marks_file) as f_in:
+            for line in f_in:
+                entry = json.loads(line)
+                marks[entry['mark']] = entry['time'] - t_start
+        os.remove(marks_file)
+
+    if 'first_flip' in marks and 'dialog_closed' in marks:
+        marks['first_flip'] -= marks['dialog_closed'] - marks['dialog']
+
+    return marks, parse_importtime(proc.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measures the startup time of experiments.')
+    parser.add_argument('scripts', nargs='+', help='Experiments to profile')
+    parser.add_argument('--exit-at', default=None, choices=['dialog', 'first_flip'],
+                        help='Exit the experiment at this point')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    args = parser.parse_args(argv)
+
+    for script in args.scripts:
+        marks, imports = profile(script, exit_at=args.exit_at)
+        print(f"\n{script}")
+        for name in ('dialog', 'first_flip'):
+            if name in marks:
+                print(f"  time to {name}: {marks[name]:.3f} s")
+
+        print(f"  slowest imports ({sum(t for t, _ in imports):.3f} s in total):")
+        for t, name in sorted(imports, reverse=True)[:args.top]:
+            print(f"  {t:8.3f} s  {name}")
+
+
+if __name__ == '__main__':
+    main()
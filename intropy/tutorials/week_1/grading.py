@@ -0,0 +1,269 @@
+""" Batch grading of the exercises checked in `tests.py`.
+
+The `test_*` functions in `tests.py` grade a single answer, print some
+feedback and raise an error when the answer is incorrect. That is exactly
+what we want inside a student's notebook, but it is slow when grading a
+whole cohort in a loop. The `grade_batch` function below grades many
+submissions to the same exercise at once and returns a `GradeResult`
+per submission instead of printing and raising. Results are memoized (see
+`memo.py`), so an answer that was graded before is not graded again.
+
+Example
+-------
+>>> from grading import grade_batch
+>>> results = grade_batch('slicing_1', [[2, 3, 4, 5, 6], [2, 3, 4]])
+>>> [res.passed for res in results]
+[True, False]
+"""
+import copy
+from collections import namedtuple
+import numpy as np
+from memo import LRUCache, answer_key
+from references import get_reference
+
+
+GradeResult = namedtuple('GradeResult', ['passed', 'error', 'diff'])
+GradeResult.__doc__ = """ Result of grading a single submission.
+
+Parameters
+----------
+passed : bool
+    Whether the submission is correct
+error : str or None
+    Kind of error ('shape', 'value' or 'type'), or None if passed
+diff : dict or None
+    Details about the difference with the correct answer, or None if passed
+"""
+
+# An exercise is defined by a function that computes the correct answer(s)
+# (None means that the cached answer from `references.py` is used), the number
+# of decimals used to compare answers (None means exact equality)
+# and, optionally, a custom check for answers that are not array-like.
+# Exercises with inputs (e.g., `compute_range_vectorized`) are graded from
+# tuples of which the last element is the answer and the preceding ones the
+# inputs; their reference function gets the inputs stacked along the first axis.
+Exercise = namedtuple('Exercise', ['reference', 'decimal', 'check'], defaults=[None, None])
+
+
+def _check_list_indexing(todo_list):
+    """ Custom check for `test_list_indexing` (nested lists, no arrays). """
+    try:
+        first, last = todo_list[2], todo_list[-1][-1][-1]
+    except (TypeError, IndexError, KeyError) as e:
+        return GradeResult(False, 'type', {'message': str(e)})
+
+    wrong = [name for name, elem in (('TO_REPLACE_1', first), ('TO_REPLACE_2', last))
+             if elem != 'REPLACED']
+    if wrong:
+        return GradeResult(False, 'value', {'not_replaced': wrong})
+
+    return GradeResult(True, None, None)
+
+
+def _ref_tvalue_computation(arr, h0):
+    arr = arr.reshape((arr.shape[0], -1))
+    return (arr.mean(axis=1) - h0) / (arr.std(axis=1) / np.sqrt(arr.shape[1] - 1))
+
+
+def _ref_compute_range_vectorized(arr):
+    return arr.max(axis=1) - arr.min(axis=1)
+
+
+EXERCISES = {
+    'list_indexing': Exercise(None, check=_check_list_indexing),
+    'slicing_1': Exercise(None),
+    'slicing_2': Exercise(None),
+    'create_array_with_zeros': Exercise(None),
+    'fill_array_with_complement': Exercise(None, 4),
+    'set_odd_indices_to_zero': Exercise(None, 4),
+    'set_lower_right_value_to_one': Exercise(None, 4),
+    'bloodpressure_index': Exercise(None, 4),
+    'boolean_indexing': Exercise(None),
+    'tvalue_computation': Exercise(_ref_tvalue_computation, 7),
+    'array_product_and_sum': Exercise(None),
+    'compute_range_vectorized': Exercise(_ref_compute_range_vectorized, 4)
+}
+
+# Results of earlier submissions, per exercise and answer
+RESULTS = LRUCache(maxsize=2 ** 16)
+
+
+def _stack(arrays):
+    """ Stacks arrays along a new first axis, or returns None if impossible.
+
+    Arrays are only stacked when they have the same shape and the same kind
+    of dtype, so that a single answer of another kind (e.g., strings instead
+    of numbers) cannot change the dtype, and thus the grade, of the others.
+    """
+    try:
+        arrays = [np.asarray(arr) for arr in arrays]
+    except (TypeError, ValueError):
+        return None
+
+    if len({arr.shape for arr in arrays}) != 1 or len({arr.dtype.kind for arr in arrays}) != 1:
+        return None
+
+    if arrays[0].dtype == object:
+        return None
+
+    return np.stack(arrays)
+
+
+def _compare(answers, c_answers, decimal):
+    """ Compares stacked answers to stacked correct answers (vectorized).
+
+    Parameters
+    ----------
+    answers : numpy.ndarray
+        Answers stacked along the first axis
+    c_answers : numpy.ndarray
+        Correct answers stacked along the first axis (or broadcastable to `answers`)
+    decimal : int or None
+        Number of decimals to compare (like `np.testing.assert_array_almost_equal`),
+        or None for exact equality
+
+    Returns
+    -------
+    results : list of GradeResult
+    """
+    n = answers.shape[0]
+    if answers.shape[1:] != c_answers.shape[1:]:
+        diff = {'shape': answers.shape[1:], 'expected_shape': c_answers.shape[1:]}
+        return [GradeResult(False, 'shape', diff) for _ in range(n)]
+
+    try:
+        if decimal is None:
+            mismatch = answers != c_answers
+        else:
+            mismatch = ~(np.abs(c_answers - answers) < 1.5 * 10.0 ** -decimal)
+    except TypeError:
+        diff = {'dtype': answers.dtype, 'expected_dtype': c_answers.dtype}
+        return [GradeResult(False, 'type', diff) for _ in range(n)]
+
+    mismatch = np.broadcast_to(mismatch, answers.shape).reshape((n, -1))
+    n_mismatch = mismatch.sum(axis=1)
+    if np.issubdtype(answers.dtype, np.number) and np.issubdtype(c_answers.dtype, np.number):
+        abs_err = np.abs(answers - c_answers).reshape((n, -1))
+        max_abs_err = abs_err.max(axis=1, initial=0)
+    else:
+        max_abs_err = np.full(n, np.nan)
+
+    results = []
+    for i in range(n):
+        if n_mismatch[i] == 0:
+            results.append(GradeResult(True, None, None))
+        else:
+            diff = {'n_mismatch': int(n_mismatch[i]), 'max_abs_err': float(max_abs_err[i])}
+            results.append(GradeResult(False, 'value', diff))
+
+    return results
+
+
+def _grade_stacked(name, exercise, answers, inputs):
+    """ Grades answers (and inputs) that are already stacked along the first axis. """
+    if exercise.reference is None:
+        c_answers = np.asarray(get_reference(name))[np.newaxis, ...]
+    else:
+        c_answers = exercise.reference(*inputs)
+
+    return _compare(answers, c_answers, exercise.decimal)
+
+
+def grade_batch(exercise, submissions, cache=RESULTS):
+    """ Grades many submissions to a single exercise at once.
+
+    Submissions that were graded before (in this or an earlier call) are
+    looked up in `cache`. When all other submissions have the same shape,
+    they are stacked into a single array and compared to the correct answer
+    in one vectorized operation. Otherwise, each submission is graded separately.
+
+    Parameters
+    ----------
+    exercise : str
+        Name of the exercise, i.e., the name of the checker in `tests.py`
+        without the "test_" prefix (e.g., 'bloodpressure_index')
+    submissions : list or numpy.ndarray
+        Submitted answers, either as a list or as an array with the submissions
+        stacked along the first axis. For exercises with inputs, each submission
+        is a tuple with the inputs followed by the answer (e.g., `(arr, ans)` for
+        'compute_range_vectorized', like the arguments of the checker)
+    cache : LRUCache
+        Cache of results (one lookup per distinct answer); None to grade all
+        submissions again (submissions stacked in an array and answers that
+        cannot be hashed exactly, see `memo.answer_key`, are never cached)
+
+    Returns
+    -------
+    results : list of GradeResult
+        One result per submission, in the same order as `submissions` (copies
+        of the cached results, so changing them does not change the cache)
+
+    Examples
+    --------
+    >>> arr = np.ones((3, 2))
+    >>> [res.passed for res in grade_batch('compute_range_vectorized', [(arr, np.zeros(2))])]
+    [True]
+    >>> grade_batch('compute_range_vectorized', np.zeros((1, 2)))
+    Traceback (most recent call last):
+        ...
+    ValueError: Exercise 'compute_range_vectorized' has inputs, so each submission should be a tuple with the inputs followed by the answer (not a stacked array)!
+    """
+    if exercise not in EXERCISES:
+        raise ValueError(f"Unknown exercise '{exercise}'; choose from {list(EXERCISES)}")
+
+    if not isinstance(submissions, np.ndarray):
+        submissions = list(submissions)
+
+    has_inputs = EXERCISES[exercise].reference is not None
+    if has_inputs and (isinstance(submissions, np.ndarray) or
+                       not all(isinstance(sub, tuple) for sub in submissions)):
+        raise ValueError(f"Exercise '{exercise}' has inputs, so each submission should be a tuple "
+                         "with the inputs followed by the answer (not a stacked array)!")
+
+    if cache is None or isinstance(submissions, np.ndarray):
+        return _grade(exercise, submissions)
+
+    # Submissions that cannot be hashed exactly (e.g., DataFrames) get their own key
+    keys = [answer_key(exercise, *(sub if has_inputs else (sub,))) or i
+            for i, sub in enumerate(submissions)]
+    results = {key: cache.get(key) if isinstance(key, bytes) else None
+               for key in dict.fromkeys(keys)}
+    todo = {key: sub for key, sub in zip(keys, submissions) if results[key] is None}
+    for key, res in zip(todo, _grade(exercise, list(todo.values()))):
+        if isinstance(key, bytes):
+            cache.put(key, res)
+        results[key] = res
+
+    return [copy.deepcopy(results[key]) for key in keys]
+
+
+def _grade(exercise, submissions):
+    """ Grades many submissions to a single exercise (without the cache). """
+    name, exercise = exercise, EXERCISES[exercise]
+    if exercise.check is not None:
+        return [exercise.check(sub) for sub in submissions]
+
+    if isinstance(submissions, np.ndarray):
+        return _grade_stacked(name, exercise, submissions, [])
+
+    submissions = list(submissions)
+    if not submissions:
+        return []
+
+    has_inputs = exercise.reference is not None
+    columns = list(zip(*submissions)) if has_inputs else [submissions]
+    stacked = [_stack(col) for col in columns]
+    if all(col is not None for col in stacked):
+        return _grade_stacked(name, exercise, stacked[-1], stacked[:-1])
+
+    # Shapes (or kinds of dtypes) differ across submissions, so grade them one by one
+    results = []
+    for sub in submissions:
+        sub = sub if has_inputs else (sub,)
+        stacked = [_stack([elem]) for elem in sub]
+        if any(elem is None for elem in stacked):
+            results.append(GradeResult(False, 'type', {'type': type(sub[-1]).__name__}))
+        else:
+            results.extend(_grade_stacked(name, exercise, stacked[-1], stacked[:-1]))
+
+    return results
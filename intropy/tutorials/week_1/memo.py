@@ -0,0 +1,155 @@
+""" Memoization of feedback on identical answers.
+
+Many students submit exactly the same answer to an exercise (both the
+correct one and common mistakes, like an off-by-one slice). Instead of
+checking every answer again, the result is stored under a hash of the
+exercise and the content of the answer (its type, dtype, shape and bytes),
+so that an answer that was seen before only costs a hash and a lookup.
+Both the number and the total size of the stored results are bounded: when
+the cache is full, the least recently used results are evicted.
+
+>>> from memo import LRUCache, answer_key
+>>> cache = LRUCache(maxsize=2)
+>>> key = answer_key('slicing_1', [2, 3, 4, 5, 6])
+>>> cache.get(key) is None
+True
+>>> cache.put(key, 'correct')
+>>> cache.get(key), cache.hits, cache.misses
+('correct', 1, 1)
+"""
+import sys
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+# Types whose repr is exact (and complete), so that it can be hashed
+_SCALARS = (str, int, float, complex, bool, type(None))
+
+
+def _update_hash(h, obj):
+    """ Adds the (canonicalized) content of an object to a hash.
+
+    Returns False if the object cannot be hashed exactly (e.g., a DataFrame,
+    whose repr is truncated), in which case the hash should not be used.
+    """
+    h.update(type(obj).__name__.encode())
+    if isinstance(obj, (list, tuple)):
+        # Element by element, so that, e.g., [1, 2.5] and [1.0, 2.5] differ
+        h.update(b'[%i]' % len(obj))
+        if not all(_update_hash(h, elem) for elem in obj):
+            return False
+    elif isinstance(obj, (np.ndarray, np.generic)) and obj.dtype != object:
+        h.update(obj.dtype.str.encode())
+        h.update(repr(obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif type(obj) in _SCALARS:
+        h.update(repr(obj).encode())
+    else:
+        return False
+
+    h.update(b'\0')
+    return True
+
+
+def answer_key(exercise, *answer):
+    """ Computes a key (hash) of an exercise and an answer.
+
+    Answers with the same type, dtype, shape and content (e.g., the same list)
+    get the same key, regardless of where they are stored in memory. Lists and
+    tuples are hashed element by element (including the type of each element).
+    Only numpy arrays (except object arrays), lists, tuples, strings, numbers
+    and None are hashed; for other answers (e.g., DataFrames), there is no key.
+
+    Parameters
+    ----------
+    exercise : str
+        Name of the exercise (e.g., 'slicing_1')
+    *answer : object
+        The answer (and, optionally, the inputs of the exercise)
+
+    Returns
+    -------
+    key : bytes or None
+        The key (a 16-byte BLAKE2 hash), or None if the answer cannot be hashed exactly
+    """
+    h = hashlib.blake2b(exercise.encode(), digest_size=16)
+    if not all(_update_hash(h, elem) for elem in answer):
+        return None
+    return h.digest()
+
+
+class LRUCache:
+    """ A bounded cache that evicts the least recently used item when it is full.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of items in the cache
+    maxbytes : int
+        Maximum total size (in bytes) of the items in the cache, or None for no limit
+    """
+    def __init__(self, maxsize=4096, maxbytes=None):
+        """ Initializes an LRUCache object. """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """ Returns the item stored under `key` (or `default` if there is none). """
+        try:
+            value, _ = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, nbytes=None):
+        """ Stores an item (evicting the least recently used items if the cache is full).
+
+        Parameters
+        ----------
+        key : hashable
+            Key of the item (e.g., from `answer_key`)
+        value : object
+            The item
+        nbytes : int
+            Size of the item (in bytes); defaults to `sys.getsizeof(value)`
+        """
+        if nbytes is None:
+            nbytes = sys.getsizeof(value)
+
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self._items and (len(self._items) > self.maxsize or
+                               (self.maxbytes is not None and self.nbytes > self.maxbytes)):
+            self.nbytes -= self._items.popitem(last=False)[1][1]
+
+    def clear(self):
+        """ Removes all items and resets the statistics. """
+        self._items.clear()
+        self.nbytes = 0
+        self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """ Fraction of lookups that found an item (NaN if there were none). """
+        n = self.hits + self.misses
+        return self.hits / n if n else np.nan
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return (f"LRUCache(size={len(self)}, maxsize={self.maxsize}, nbytes={self.nbytes}, "
+                f"maxbytes={self.maxbytes}, hits={self.hits}, "
+                f"misses={self.misses}, hit_rate={self.hit_rate:.3f})")
@@ -0,0 +1,151 @@
+""" Registry of the correct answers used by the checkers in `tests.py`.
+
+Each correct answer is computed only once, the first time it is requested,
+after which it is cached in memory. Array answers are made read-only and
+other answers (e.g., lists) are returned as copies, so that a checker (or
+student) cannot accidentally modify the cached answer.
+
+Optionally, array answers can also be cached on disk as `.npy` files by
+setting the `INTROPY_REFERENCE_CACHE` environment variable to a directory.
+The filename contains a hash of the source code of the function that
+computes the answer (and the NumPy version), so changing that function
+automatically invalidates the cached file.
+"""
+import os
+import copy
+import hashlib
+import inspect
+import numpy as np
+
+
+_REFERENCES = {}
+_CACHE = {}
+
+
+def reference(func):
+    """ Registers a function that computes a correct answer.
+
+    The answer is registered under the name of the function, which
+    should be the name of the checker without the "test_" prefix.
+    """
+    _REFERENCES[func.__name__] = func
+    return func
+
+
+def _source_hash(func):
+    """ Computes a hash of the source code of `func` (and the NumPy version). """
+    try:
+        src = inspect.getsource(func).encode()
+    except (OSError, TypeError):  # e.g., when defined interactively
+        src = func.__code__.co_code
+
+    return hashlib.sha1(src + np.__version__.encode()).hexdigest()[:12]
+
+
+def get_reference(name):
+    """ Returns the (cached) correct answer of an exercise.
+
+    Parameters
+    ----------
+    name : str
+        Name of the exercise (e.g., 'bloodpressure_index')
+
+    Returns
+    -------
+    c_answer : object
+        The correct answer (read-only if it is a numpy array, otherwise a copy)
+    """
+    if name in _CACHE:
+        return _copy(_CACHE[name])
+
+    func = _REFERENCES[name]
+    cache_dir = os.environ.get('INTROPY_REFERENCE_CACHE')
+    fname = None
+    if cache_dir is not None:
+        fname = os.path.join(cache_dir, f'{name}-{_source_hash(func)}.npy')
+
+    if fname is not None and os.path.isfile(fname):
+        c_answer = np.load(fname)
+    else:
+        c_answer = func()
+        if fname is not None and isinstance(c_answer, np.ndarray):
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write to a temporary file (per process) first, so that other
+            # processes never load a partially written file
+            tmp = f'{fname}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f_out:
+                np.save(f_out, c_answer, allow_pickle=False)
+            os.replace(tmp, fname)
+
+    if isinstance(c_answer, np.ndarray):
+        c_answer.setflags(write=False)
+
+    _CACHE[name] = c_answer
+    return _copy(c_answer)
+
+
+def _copy(c_answer):
+    """ Returns read-only arrays as they are and a copy of other (mutable) answers. """
+    return c_answer if isinstance(c_answer, np.ndarray) else copy.deepcopy(c_answer)
+
+
+def clear_cache():
+    """ Removes all correct answers from the in-memory cache. """
+    _CACHE.clear()
+
+
+@reference
+def slicing_1():
+    return [2, 3, 4, 5, 6]
+
+
+@reference
+def slicing_2():
+    return [5, 7, 9, 11]
+
+
+@reference
+def create_array_with_zeros():
+    return np.zeros((2, 3, 5, 3, 7))
+
+
+@reference
+def fill_array_with_complement():
+    return 1.0 / np.arange(1, 9)
+
+
+@reference
+def set_odd_indices_to_zero():
+    c_answer = np.arange(3, 25)
+    c_answer[1::2] = 0.0
+    return c_answer
+
+
+@reference
+def set_lower_right_value_to_one():
+    c_answer = np.zeros((3, 3))
+    c_answer[-1, -1] = 1.0
+    return c_answer
+
+
+@reference
+def bloodpressure_index():
+    # Use a separate generator, so that we don't reset the global seed
+    rs = np.random.RandomState(42)
+    bp_data = rs.normal(loc=100, scale=5, size=(20, 24, 30, 2))
+    return bp_data[:, :, 17, 1]
+
+
+@reference
+def boolean_indexing():
+    my_array = np.array([[0, 1, -1, -2],
+                         [2, -5, 1, 4],
+                         [10, -2, -4, 20]])
+    return my_array[my_array ** 2 > 4]
+
+
+@reference
+def array_product_and_sum():
+    arr_A = np.arange(10).reshape((5, 2))
+    arr_B = np.arange(10, 20).reshape((5, 2))
+    return (arr_A * arr_B) + 5
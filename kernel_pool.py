@@ -0,0 +1,264 @@
+""" A pool of warm Jupyter kernels to execute many notebooks with.
+
+Starting a kernel and importing numpy, pandas, scipy and matplotlib takes
+a couple of seconds, which adds up when executing every notebook in a fresh
+kernel (like `pytest --nbval` does). A `KernelPool` starts its kernels once,
+pre-imports the course's heavy dependencies and resets the namespace of a
+kernel before it is reused for the next notebook.
+
+Example
+-------
+>>> pool = KernelPool(size=2)
+>>> with pool.kernel(cwd='intropy/solutions/week_1') as kc:
+...     cells = run_notebook(kc, 'intropy/solutions/week_1/4_numpy.ipynb')
+>>> print(pool.report())
+>>> pool.shutdown()
+"""
+import os
+import json
+import time
+import queue
+from contextlib import contextmanager
+from jupyter_client.manager import KernelManager
+
+
+# Modules that (almost) every notebook of the course imports
+PREIMPORT = ['numpy', 'pandas', 'scipy', 'matplotlib', 'matplotlib.pyplot']
+
+# Executed in a kernel before it is reused: clears all variables, closes
+# figures, reseeds numpy's global random generator, forgets modules that live
+# in the course directory (such as `tests` and `utils`, which differ per week)
+# and moves to the directory of the next notebook. Installed packages are never
+# forgotten, even if they live in the course directory (e.g., in a local venv),
+# because C extensions (such as numpy's) cannot be imported a second time
+RESET_CODE = """
+%reset -f
+import os as _os, sys as _sys
+_installed = tuple(_os.path.join(_p, '') for _p in {{_sys.prefix, _sys.base_prefix, _sys.exec_prefix}})
+for _name, _mod in list(_sys.modules.items()):
+    _file = getattr(_mod, '__file__', None) or ''
+    if (_file.startswith({root!r}) and not _file.startswith(_installed)
+            and 'site-packages' not in _file and 'dist-packages' not in _file):
+        del _sys.modules[_name]
+if 'matplotlib.pyplot' in _sys.modules:
+    _sys.modules['matplotlib.pyplot'].close('all')
+if 'numpy' in _sys.modules:
+    _sys.modules['numpy'].random.seed(None)
+_os.chdir({cwd!r})
+del _os, _sys, _installed, _name, _mod, _file
+"""
+
+# Notebook cells with these markers (in the source or tags) are treated as nbval does
+SKIP_MARKERS = ('NBVAL_SKIP', 'nbval-skip')
+RAISES_MARKERS = ('NBVAL_RAISES_EXCEPTION', 'raises-exception')
+
+
+class CellTimeout(TimeoutError):
+    """ Raised when a cell runs longer than allowed (the kernel is then still busy). """
+    def __init__(self, msg, cells):
+        super().__init__(msg)
+        self.cells = cells
+
+
+class WarmKernel:
+    """ A started kernel (manager + client) and some bookkeeping. """
+    def __init__(self, kernel_name, preimport):
+        """ Starts the kernel and imports the modules in `preimport`. """
+        t_start = time.time()
+        self.km = KernelManager(kernel_name=kernel_name)
+        self.km.start_kernel()
+        self.kc = self.km.client()
+        self.kc.start_channels()
+        self.kc.wait_for_ready(timeout=60)
+        code = '\n'.join(f'try:\n    import {mod}\nexcept ImportError:\n    pass' for mod in preimport)
+        self.kc.execute_interactive(code, silent=True, store_history=False)
+        self.startup_time = time.time() - t_start
+        self.n_uses = 0
+
+    def is_alive(self):
+        return self.km.is_alive()
+
+    def shutdown(self):
+        self.kc.stop_channels()
+        self.km.shutdown_kernel(now=True)
+
+
+class KernelPool:
+    """ A pool of warm kernels that can be reused across notebooks.
+
+    Parameters
+    ----------
+    size : int
+        Number of kernels in the pool
+    kernel_name : str
+        Name of the kernelspec to start
+    preimport : list
+        Modules to import when starting a kernel
+    max_uses : int
+        Number of notebooks after which a kernel is replaced by a fresh one
+        (to limit leaking state, such as monkeypatched modules)
+    root : str
+        Directory of the course files; modules imported from this directory
+        are removed from the kernel when it is reset (except installed
+        packages, e.g., in a virtual environment inside this directory)
+    """
+    def __init__(self, size=1, kernel_name='python3', preimport=PREIMPORT, max_uses=20, root=None):
+        self.kernel_name = kernel_name
+        self.preimport = preimport
+        self.max_uses = max_uses
+        self.root = os.path.abspath(root or os.getcwd())
+        self.startup_times = []
+        self.reset_times = []
+        self._idle = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            self._idle.put(self._start())
+
+    def _start(self):
+        wk = WarmKernel(self.kernel_name, self.preimport)
+        self.startup_times.append(wk.startup_time)
+        self._all.append(wk)
+        return wk
+
+    def _discard(self, wk):
+        self._all.remove(wk)
+        wk.shutdown()
+
+    @contextmanager
+    def kernel(self, cwd='.'):
+        """ Borrows a (reset) kernel from the pool.
+
+        Parameters
+        ----------
+        cwd : str
+            Working directory for the kernel (usually the notebook's directory)
+
+        Yields
+        ------
+        kc : jupyter_client.BlockingKernelClient
+            Client of the borrowed kernel
+        """
+        wk = self._idle.get()
+        if not wk.is_alive() or wk.n_uses >= self.max_uses:
+            self._discard(wk)
+            wk = self._start()
+
+        if wk.n_uses > 0:
+            t_start = time.time()
+            code = RESET_CODE.format(root=os.path.join(self.root, ''), cwd=os.path.abspath(cwd))
+            wk.kc.execute_interactive(code, silent=True, store_history=False, timeout=60)
+            self.reset_times.append(time.time() - t_start)
+        else:
+            wk.kc.execute_interactive(f'import os; os.chdir({os.path.abspath(cwd)!r})',
+                                      silent=True, store_history=False, timeout=60)
+
+        wk.n_uses += 1
+        healthy = False
+        try:
+            yield wk.kc
+            healthy = True
+        finally:
+            if healthy and wk.is_alive():
+                self._idle.put(wk)
+            else:  # e.g., after a timeout, the kernel may still be busy
+                self._discard(wk)
+                self._idle.put(self._start())
+
+    def report(self):
+        """ Summarizes how much kernel startup time was saved by reusing kernels. """
+        return report_savings(self.startup_times, self.reset_times)
+
+    def shutdown(self):
+        """ Shuts down all kernels in the pool. """
+        for wk in list(self._all):
+            self._discard(wk)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+def report_savings(startup_times, reset_times):
+    """ Summarizes how much time was saved by resetting instead of starting kernels.
+
+    Parameters
+    ----------
+    startup_times : list
+        Time (in seconds) it took to start each kernel
+    reset_times : list
+        Time (in seconds) it took to reset a kernel, each time it was reused
+
+    Returns
+    -------
+    report : str
+        A one-line summary
+    """
+    if not startup_times:
+        return "No kernels were started."
+
+    mean_startup = sum(startup_times) / len(startup_times)
+    saved = len(reset_times) * mean_startup - sum(reset_times)
+    return (f"Started {len(startup_times)} kernel(s) ({mean_startup:.2f} s on average) "
+            f"and reused them {len(reset_times)} time(s), which saved ~{saved:.1f} s.")
+
+
+def run_notebook(kc, path, timeout=120):
+    """ Executes all code cells of a notebook in a (warm) kernel.
+
+    Parameters
+    ----------
+    kc : jupyter_client.BlockingKernelClient
+        Client of the kernel to execute the cells in
+    path : str
+        Path to the notebook
+    timeout : int
+        Maximum time (in seconds) that each cell is allowed to run
+
+    Returns
+    -------
+    cells : list of dict
+        Per executed cell, its index, first line of code, execution time (in seconds)
+        and error (None if the cell ran as expected)
+
+    Raises
+    ------
+    CellTimeout
+        When a cell runs longer than `timeout` seconds
+    """
+    with open(path, encoding='utf-8') as f_in:
+        nb = json.load(f_in)
+
+    cells = []
+    for idx, cell in enumerate(nb['cells']):
+        if cell['cell_type'] != 'code':
+            continue
+
+        source = ''.join(cell['source'])
+        markers = source + ' ' + ' '.join(cell.get('metadata', {}).get('tags', []))
+        if not source.strip() or any(m in markers for m in SKIP_MARKERS):
+            continue
+
+        first_line = source.strip().splitlines()[0][:80]
+        t_start = time.time()
+        try:
+            reply = kc.execute_interactive(source, timeout=timeout, output_hook=lambda msg: None)
+        except TimeoutError:
+            msg = f'Cell {idx} timed out after {timeout} seconds'
+            cells.append({'cell': idx, 'line': first_line, 'time': time.time() - t_start,
+                          'error': msg})
+            raise CellTimeout(msg, cells)
+
+        content = reply['content']
+        raises = any(m in markers for m in RAISES_MARKERS)
+        error = None
+        if content['status'] == 'error' and not raises:
+            error = f"{content['ename']}: {content['evalue']}"
+        elif content['status'] == 'ok' and raises:
+            error = 'Expected an exception, but the cell ran without errors'
+
+        cells.append({'cell': idx, 'line': first_line, 'time': time.time() - t_start,
+                      'error': error})
+
+    return cells
@@ -0,0 +1,71 @@
+""" Post-processes the HTML of the (solution) notebooks after building the book.
+
+For each notebook, this
+    1. replaces the Jupyterhub "git-pull" link by a link to the Jupyterhub itself;
+    2. points all remaining references to solutions/week_1 to tutorials/week_1;
+    3. adds some padding to the admonitions (warning/info/success/danger boxes).
+
+All rules are combined in a single regular expression, so that each file is
+read and written only once, and files are processed in parallel, e.g.:
+
+    python postprocess_html.py intropy/_build/html/solutions/week_1/*.html
+"""
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+HUB_URL = 'https://neuroimaging.lukas-snoek.com'
+GIT_PULL_URL = (re.escape(HUB_URL + '/hub/user-redirect/git-pull?repo=https://github.com/lukassnoek/introPy')
+                + '(?:&|&amp;)urlpath=lab/tree/introPy/intropy/solutions/week_1/[^"\'&]+?\\.ipynb'
+                + '(?:&|&amp;)branch=master')
+
+# Each rule is a (name, pattern) pair; the replacements are defined in `_replace`
+RULES = [
+    ('hub', GIT_PULL_URL),
+    ('path', 'solutions/week_1'),
+    ('admonition', '<div class=(?P<q>[\'"])alert alert-(?:warning|info|success|danger)(?P=q)>')
+]
+PATTERN = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in RULES))
+
+
+def _replace(match):
+    """ Returns the replacement of a single match of `PATTERN`. """
+    if match.lastgroup == 'hub':
+        return HUB_URL
+    elif match.lastgroup == 'path':
+        return 'tutorials/week_1'
+    else:  # admonition
+        q = match.group('q')
+        return f'{match.group(0)[:-1]} style={q}padding-bottom:10px{q}>'
+
+
+def fix_file(path):
+    """ Applies all rules to a single HTML file (line by line) and overwrites it.
+
+    Returns
+    -------
+    n_subs : int
+        Number of replacements
+    """
+    tmp_path = path + '.tmp'
+    n_subs = 0
+    with open(path, encoding='utf-8') as f_in, open(tmp_path, 'w', encoding='utf-8') as f_out:
+        for line in f_in:
+            line, n = PATTERN.subn(_replace, line)
+            n_subs += n
+            f_out.write(line)
+
+    os.replace(tmp_path, path)
+    return n_subs
+
+
+def main(paths):
+    with ProcessPoolExecutor() as pool:
+        for path, n_subs in zip(paths, pool.map(fix_file, paths)):
+            print(f"Fixed {path} ({n_subs} replacements)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,253 @@
+""" Validates notebooks by executing them in a pool of warm kernels.
+
+This is a faster alternative to `pytest --nbval` (which starts a new kernel
+for every notebook): all notebooks are executed in kernels from a
+`KernelPool`, which are started (and import the heavy dependencies) only once.
+A notebook fails when one of its cells raises an error.
+
+Notebooks can be distributed across several worker processes (`--workers`),
+each with its own warm kernel, and across several CI jobs (`--shard i/n`).
+Each notebook is assigned to a shard by a hash of its path, so that all jobs
+agree on the shards, whatever timings they have. Cells depend on the state
+created by earlier cells, so a notebook is never split; instead, the notebooks
+of a shard are scheduled longest-first, based on the timings of previous runs
+(`--timings`), which keeps a single large notebook from finishing last. Each
+run adds the execution time per notebook and per cell to a report (`--report`).
+
+Notebooks that passed before are skipped if nothing they depend on changed,
+i.e., their code cells, the local files these cells refer to (data files,
+images, modules; see `book_cache.find_dependencies`) and the installed
+packages (`--cache-dir`). Use it through `./test_material --warm` or
+directly, e.g.:
+
+    python validate_notebooks.py --workers 4 intropy/solutions/week_1/*.ipynb
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import platform
+from importlib import metadata
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from kernel_pool import KernelPool, CellTimeout, run_notebook, report_savings
+from book_cache import find_dependencies
+
+
+# The warm kernel pool of a worker process
+_POOL = None
+
+
+def _init_worker(root):
+    """ Starts the kernel pool of a worker process (and shuts it down at exit). """
+    global _POOL
+    _POOL = KernelPool(size=1, root=root)
+    Finalize(_POOL, _POOL.shutdown, exitpriority=10)
+
+
+def _validate_one(nb, timeout):
+    """ Validates a single notebook in the worker's kernel pool. """
+    try:
+        with _POOL.kernel(cwd=os.path.dirname(os.path.abspath(nb))) as kc:
+            cells = run_notebook(kc, nb, timeout=timeout)
+    except CellTimeout as e:
+        cells = e.cells
+
+    return nb, cells, os.getpid(), (list(_POOL.startup_times), list(_POOL.reset_times))
+
+
+def environment_hash():
+    """ Computes a hash of the Python version and all installed packages (and versions). """
+    dists = sorted(f"{d.metadata['Name']}=={d.version}" for d in metadata.distributions())
+    return hashlib.sha1('\n'.join([platform.python_version()] + dists).encode()).hexdigest()
+
+
+def cache_key(nb, env_hash):
+    """ Computes a key for a notebook from its code, its dependencies and the environment. """
+    with open(nb, encoding='utf-8') as f_in:
+        cells = json.load(f_in)['cells']
+
+    h = hashlib.sha1(env_hash.encode())
+    for cell in cells:
+        if cell['cell_type'] == 'code':
+            h.update(''.join(cell['source']).encode() + b'\0')
+
+    for path in find_dependencies(nb, code_only=True):
+        with open(path, 'rb') as f_in:
+            h.update(os.path.basename(path).encode() + f_in.read())
+
+    return h.hexdigest()
+
+
+def load_cached(nb, key, cache_dir):
+    """ Returns the (passing) cell results of a notebook stored under `key`, or None. """
+    path = os.path.join(cache_dir, f'{os.path.basename(nb)}-{key}.json')
+    if not os.path.isfile(path):
+        return None
+
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def store_cached(nb, key, cells, cache_dir):
+    """ Stores the cell results of a notebook that passed under `key`. """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, f'{os.path.basename(nb)}-{key}.json'), 'w') as f_out:
+        json.dump(cells, f_out)
+
+
+def load_timings(path):
+    """ Loads the total time per notebook from an earlier report (if it exists). """
+    if path is None or not os.path.isfile(path):
+        return {}
+
+    with open(path) as f_in:
+        return {nb: info['time'] for nb, info in json.load(f_in).items()}
+
+
+def schedule(notebooks, timings, shard=(1, 1)):
+    """ Selects the notebooks of a single shard and orders them longest-first.
+
+    Notebooks are assigned to shards by a hash of their (normalized) path, so
+    the shards do not depend on the timings (which differ between CI jobs that
+    ran different shards before). Notebooks without timings are assumed to be average.
+
+    Parameters
+    ----------
+    notebooks : list
+        Paths to the notebooks
+    timings : dict
+        Total execution time (in seconds) per notebook from an earlier run
+    shard : tuple
+        Index (starting at 1) and total number of shards
+
+    Returns
+    -------
+    notebooks : list
+        The notebooks of the given shard, longest first
+    """
+    idx, n_shards = shard
+    selected = [nb for nb in notebooks if _shard_of(nb, n_shards) == idx - 1]
+    default = sum(timings.values()) / len(timings) if timings else 1.0
+    return sorted(selected, key=lambda nb: (-timings.get(nb, default), nb))
+
+
+def _shard_of(nb, n_shards):
+    """ Returns the (zero-based) shard of a notebook, from a hash of its path. """
+    digest = hashlib.sha1(os.path.normpath(nb).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % n_shards
+
+
+def validate(notebooks, timeout=120, root='intropy', workers=1):
+    """ Executes notebooks and checks whether they run without errors.
+
+    Parameters
+    ----------
+    notebooks : list
+        Paths to the notebooks (executed in this order)
+    timeout : int
+        Maximum time (in seconds) that each cell is allowed to run
+    root : str
+        Directory of the course files (see `KernelPool`)
+    workers : int
+        Number of worker processes (each with its own kernel)
+
+    Returns
+    -------
+    results : dict
+        For each notebook (keys), a list with the results per cell (see `run_notebook`)
+    """
+    results, stats = {}, {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(root,)) as pool:
+        futures = [pool.submit(_validate_one, nb, timeout) for nb in notebooks]
+        for future in as_completed(futures):
+            nb, cells, pid, stats[pid] = future.result()
+            print(f"Validated {nb} ({sum(c['time'] for c in cells):.1f} s)")
+            results[nb] = cells
+
+    startup_times = [t for startup, _ in stats.values() for t in startup]
+    reset_times = [t for _, reset in stats.values() for t in reset]
+    print(report_savings(startup_times, reset_times))
+    return {nb: results[nb] for nb in notebooks}
+
+
+def write_report(results, path, n_slowest=10):
+    """ Adds the timings per notebook and per cell to a report, and prints the slowest cells.
+
+    Notebooks that are not in `results` (e.g., those of other shards) keep
+    the timings they had in the report.
+    """
+    report = {}
+    if os.path.isfile(path):
+        with open(path) as f_in:
+            report = json.load(f_in)
+
+    report.update({nb: {'time': sum(c['time'] for c in cells), 'cells': cells}
+                   for nb, cells in results.items()})
+    with open(path, 'w') as f_out:
+        json.dump(report, f_out, indent=1)
+
+    all_cells = [(c['time'], nb, c) for nb, cells in results.items() for c in cells]
+    print(f"\nSlowest cells (full report in {path}):")
+    for t, nb, c in sorted(all_cells, key=lambda x: -x[0])[:n_slowest]:
+        print(f"{t:8.2f} s  {os.path.basename(nb)} (cell {c['cell']}): {c['line']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validates notebooks with warm kernels.')
+    parser.add_argument('notebooks', nargs='+', help='Notebooks to validate')
+    parser.add_argument('--timeout', type=int, default=120,
+                        help='Maximum time (in seconds) per cell')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes')
+    parser.add_argument('--shard', default='1/1',
+                        help='Only validate this shard of the notebooks, e.g., 2/3')
+    parser.add_argument('--timings', default='notebook_timings.json',
+                        help='Report of earlier runs, used to order the notebooks')
+    parser.add_argument('--report', default='notebook_timings.json',
+                        help='Report to add the timings of this run to')
+    parser.add_argument('--cache-dir', default='.notebook_cache',
+                        help='Where to store the results of notebooks that passed')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Execute all notebooks, even if they passed before')
+    args = parser.parse_args(argv)
+
+    shard = tuple(int(i) for i in args.shard.split('/'))
+    notebooks = schedule(args.notebooks, load_timings(args.timings), shard)
+
+    keys, results = {}, {}
+    if not args.no_cache:
+        env_hash = environment_hash()
+        for nb in notebooks:
+            keys[nb] = cache_key(nb, env_hash)
+            cached = load_cached(nb, keys[nb], args.cache_dir)
+            if cached is not None:
+                print(f"Skipped {nb} (passed before and did not change)")
+                results[nb] = cached
+
+    to_run = [nb for nb in notebooks if nb not in results]
+    if to_run:
+        results.update(validate(to_run, timeout=args.timeout, workers=args.workers))
+
+    results = {nb: results[nb] for nb in notebooks}
+    write_report(results, args.report)
+    for nb in to_run:
+        if nb in keys and all(c['error'] is None for c in results[nb]):
+            store_cached(nb, keys[nb], results[nb], args.cache_dir)
+
+    n_failed = 0
+    for nb, cells in results.items():
+        errors = [c for c in cells if c['error'] is not None]
+        if errors:
+            n_failed += 1
+            for c in errors:
+                print(f"FAILED {nb} (cell {c['cell']}): {c['error']}")
+
+    print(f"{len(results) - n_failed} passed, {n_failed} failed")
+    return 1 if n_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())